@@ -1,27 +1,76 @@
+import os
+import tempfile
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-from data_handler import save_data, load_data, search_data, delete_report
-from visualizations import create_rejection_summary_chart, create_daily_production_chart
-from pdf_generator import create_pdf_report
-
-def calculate_total_cans(row):
-    """Calculate total cans including all rejections and samples"""
-    base_cans = row['TotalCase'] + row['LooseCans']
-    rejection_fields = [
-        'EmptyRejection', 'FilledRejection', 'BreakdownRejection',
-        'ManpowerDentRejection', 'HighPressureRejection', 'WaterCanRejection',
-        'MachineDentCans', 'FadeCans', 'UnprintedCans', 'ScratchedCans',
-        'LidRejection', 'QASample', 'QAOtherSample'
-    ]
-    rejection_total = sum(row[field] for field in rejection_fields)
-    return base_cans + rejection_total
+from schema import COLUMNS, ENTRY_COLUMNS, ID_COLUMN, LABELS, HELP, FORM_SECTIONS, MAX_COUNT
+from metrics import add_metrics, group_metrics
+from data_handler import (
+    load_data, load_rollup, load_rejection_analytics, query_data, query_page, count_data, delete_report, data_version,
+    deleted_reports, restore_reports, archive_in_background, has_reports
+)
+from bulk_import import import_file
+from write_queue import DEAD_LETTER_FILE, enqueue_report, failed_count, pending_count, start_writer
+from search_index import parse_patterns, is_exact
+from rollup import GRANULARITIES, MAX_CHART_POINTS, OTHER_VARIANTS, bucket_rollup
+from export_cache import get_export, get_or_create_export
+import profiling
+
+# Rows per page offered on View Reports
+PAGE_SIZES = [25, 50, 100, 250]
+
+# PDF export layouts and the pdf_generator mode behind each
+PDF_LAYOUTS = {"One page per report": "detailed", "Summary tables": "summary"}
+
+def diagnostics_page():
+    """Hidden page (open the app with ?page=diagnostics) showing profiled calls"""
+    st.header("Diagnostics")
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        enabled = st.toggle("Record calls", value=profiling.is_enabled())
+    with col2:
+        memory = st.toggle("Trace memory (slow)", value=profiling.is_tracing_memory(), disabled=not enabled)
+    if enabled != profiling.is_enabled() or memory != profiling.is_tracing_memory():
+        if enabled:
+            profiling.enable(memory=memory)
+        else:
+            profiling.disable()
+    with col3:
+        if st.button("Clear"):
+            profiling.clear_records()
+
+    records = profiling.get_records()
+    if not records:
+        st.info("No calls recorded yet. Enable recording here or start the app with RTD_PROFILE=1.")
+        return
+
+    st.subheader("Per entry point")
+    st.dataframe(profiling.summary().round(4), use_container_width=True)
+
+    st.subheader("Recent calls")
+    st.dataframe(pd.DataFrame(records[::-1]), hide_index=True, use_container_width=True)
+    st.download_button(
+        label="Download JSON",
+        data=profiling.dump_json(),
+        file_name=f"diagnostics_{datetime.now():%Y%m%d_%H%M%S}.json",
+        mime="application/json"
+    )
 
 def main():
     st.title("Production Daily Report Entry System")
 
+    # Saves queued form submissions, replaying any left over from a restart
+    start_writer()
+    # Rolls months older than HOT_MONTHS into the compressed archive, once a day
+    archive_in_background()
+
+    if st.query_params.get("page") == "diagnostics":
+        diagnostics_page()
+        return
+
     # Sidebar navigation
-    page = st.sidebar.selectbox("Choose a page", ["Daily Entry", "View Reports", "Analytics"])
+    page = st.sidebar.selectbox("Choose a page", ["Daily Entry", "View Reports", "Analytics", "Bulk Import"])
 
     if page == "Daily Entry":
         st.header("Daily Production Report Form")
@@ -31,56 +80,22 @@ def main():
             st.markdown("### Basic Information")
             col1, col2, col3 = st.columns(3)
             with col1:
-                date = st.date_input("📅 Report Date", datetime.now())
+                date = st.date_input(LABELS["Date"], datetime.now())
             with col2:
-                variant_name = st.text_input("🏷️ Variant Name")
+                variant_name = st.text_input(LABELS["VariantName"])
             with col3:
-                batch_code = st.text_input("📦 Batch Code")
-
-            st.markdown("### Production Quantities")
-            col4, col5, col6 = st.columns(3)
-            with col4:
-                total_case = st.number_input("📦 Total Case", min_value=0, help="Enter the total number of cases")
-            with col5:
-                loose_cans = st.number_input("🥫 Loose Cans", min_value=0, help="Enter number of loose cans")
-            with col6:
-                wip_cans = st.number_input("⚙️ WIP Cans", min_value=0, help="Work in progress cans")
-
-            # QA Samples Section
-            st.markdown("### QA Samples")
-            col7, col8, col9 = st.columns(3)
-            with col7:
-                qa_sample = st.number_input("🔍 QA Sample", min_value=0)
-            with col8:
-                qa_other_sample = st.number_input("🔍 QA Other Sample", min_value=0)
-            with col9:
-                empty_sample = st.number_input("🔍 Empty Sample", min_value=0)
-
-            # Rejections Section
-            st.markdown("### Rejections")
-
-            # Primary Rejections
-            col10, col11, col12 = st.columns(3)
-            with col10:
-                empty_rejection = st.number_input("Empty Rejection", min_value=0)
-                filled_rejection = st.number_input("Filled Rejection", min_value=0)
-                breakdown_rejection = st.number_input("Breakdown Rejection", min_value=0)
-            with col11:
-                manpower_dent_rejection = st.number_input("Manpower Dent", min_value=0)
-                high_pressure_rejection = st.number_input("High Pressure", min_value=0)
-                water_can_rejection = st.number_input("Water Can", min_value=0)
-            with col12:
-                machine_dent_cans = st.number_input("Machine Dent", min_value=0)
-                fade_cans = st.number_input("Fade Cans", min_value=0)
-                lid_rejection = st.number_input("Lid Rejection", min_value=0)
-
-            # Secondary Rejections
-            col13, col14 = st.columns(2)
-            with col13:
-                unprinted_cans = st.number_input("Unprinted Cans", min_value=0)
-                scratched_cans = st.number_input("Scratched Cans", min_value=0)
-            with col14:
-                reject_shipper = st.number_input("Reject Shipper", min_value=0)
+                batch_code = st.text_input(LABELS["BatchCode"])
+
+            counts = {}
+            for section, field_columns in FORM_SECTIONS:
+                if section:
+                    st.markdown(f"### {section}")
+                for column, fields in zip(st.columns(len(field_columns)), field_columns):
+                    with column:
+                        for field in fields:
+                            counts[field] = st.number_input(
+                                LABELS[field], min_value=0, max_value=MAX_COUNT, help=HELP.get(field)
+                            )
 
             submitted = st.form_submit_button("Submit Report")
 
@@ -89,49 +104,46 @@ def main():
                     "Date": date,
                     "VariantName": variant_name,
                     "BatchCode": batch_code,
-                    "TotalCase": total_case,
-                    "LooseCans": loose_cans,
-                    "EmptyRejection": empty_rejection,
-                    "EmptySample": empty_sample,
-                    "WIPCans": wip_cans,
-                    "FilledRejection": filled_rejection,
-                    "BreakdownRejection": breakdown_rejection,
-                    "ManpowerDentRejection": manpower_dent_rejection,
-                    "HighPressureRejection": high_pressure_rejection,
-                    "WaterCanRejection": water_can_rejection,
-                    "MachineDentCans": machine_dent_cans,
-                    "FadeCans": fade_cans,
-                    "UnprintedCans": unprinted_cans,
-                    "ScratchedCans": scratched_cans,
-                    "LidRejection": lid_rejection,
-                    "QASample": qa_sample,
-                    "QAOtherSample": qa_other_sample,
-                    "RejectShipper": reject_shipper
+                    **counts
                 }
-                save_data(data)
-                st.success("Daily report saved successfully!")
+                try:
+                    enqueue_report(data)
+                    st.success("Daily report queued; it is written to storage in the background")
+                except ValueError as e:
+                    st.error(f"Report not saved: {e}")
+
+        pending = pending_count()
+        if pending:
+            st.caption(f"{pending} submitted reports are still being written to storage")
+        failed = failed_count()
+        if failed:
+            st.warning(f"{failed} submitted reports could not be saved; they are kept in {DEAD_LETTER_FILE}")
 
     elif page == "View Reports":
         st.header("View Daily Reports")
 
         # Filters
+        filter_help = "Separate several values with commas; end a value with * to match a prefix"
         col1, col2 = st.columns(2)
         with col1:
             start_date = st.date_input("Start Date")
-            variant_filter = st.text_input("Filter by Variant Name")
+            variant_filter = st.text_input("Filter by Variant Name", help=filter_help)
         with col2:
             end_date = st.date_input("End Date")
-            batch_filter = st.text_input("Filter by Batch Code")
-
-        df = load_data()
-        if df is not None and not df.empty:
-            filtered_df = search_data(
-                df, 
-                start_date=start_date,
-                end_date=end_date,
-                batch_code=batch_filter if batch_filter else None,
-                variant_name=variant_filter if variant_filter else None
-            )
+            batch_filter = st.text_input("Filter by Batch Code", help=filter_help)
+        ignore_case = st.checkbox("Ignore case")
+
+        filters = {
+            "start_date": start_date,
+            "end_date": end_date,
+            "batch_code": parse_patterns(batch_filter.split(",")),
+            "variant_name": parse_patterns(variant_filter.split(",")),
+            "case_sensitive": not ignore_case
+        }
+        exact_filters = not ignore_case and is_exact(filters["batch_code"]) and is_exact(filters["variant_name"])
+
+        if has_reports():
+            total_reports = count_data(**filters)
 
             # Single delete option with password protection
             st.subheader("Delete Option")
@@ -143,116 +155,247 @@ def main():
 
             if st.button("🗑️ Delete Reports", type="secondary"):
                 if password == admin_password:
-                    if delete_option == "Delete Filtered Reports":
+                    if delete_option == "Delete Filtered Reports" and not exact_filters:
+                        st.error("Filtered deletes need a single exact variant and batch code")
+                    elif delete_option == "Delete Filtered Reports":
                         confirm = st.warning("Are you sure you want to delete all filtered reports?", icon="⚠️")
                         if confirm:
-                            df = delete_report(
-                                df,
+                            delete_report(
+                                load_data(),
                                 start_date if start_date == end_date else None,
-                                batch_filter if batch_filter else None,
-                                variant_filter if variant_filter else None
+                                filters["batch_code"] and filters["batch_code"][0],
+                                filters["variant_name"] and filters["variant_name"][0]
                             )
                             st.success("Filtered reports deleted successfully!")
                             st.rerun()
                     else:
-                        confirm = st.warning("Are you sure you want to delete ALL reports? This cannot be undone!", icon="⚠️")
+                        confirm = st.warning("Are you sure you want to delete ALL reports? They can be restored from Recently Deleted.", icon="⚠️")
                         if confirm:
-                            df = delete_report(df, delete_all=True)
+                            delete_report(load_data(), delete_all=True)
                             st.success("All reports deleted successfully!")
                             st.rerun()
                 else:
                     st.error("Incorrect password!")
 
-            # Display all data in an organized table
-            if not filtered_df.empty:
+            # Deleted reports are archived and can be put back
+            archived = deleted_reports()
+            if not archived.empty:
+                with st.expander(f"Recently Deleted ({len(archived)})"):
+                    recent = archived.iloc[::-1].head(500)
+                    st.dataframe(
+                        recent[["DeletedAt", "Date", "VariantName", "BatchCode", "TotalCase", ID_COLUMN]],
+                        hide_index=True,
+                        use_container_width=True
+                    )
+                    labels = {
+                        report_id: f"{report_date} - {variant} ({batch})"
+                        for report_id, report_date, variant, batch in zip(
+                            recent[ID_COLUMN], recent["Date"].dt.strftime("%Y-%m-%d").fillna("no date"),
+                            recent["VariantName"], recent["BatchCode"]
+                        )
+                    }
+                    to_restore = st.multiselect("Reports to restore", list(labels), format_func=labels.get)
+                    if st.button("Restore Selected", disabled=not to_restore):
+                        if password == admin_password:
+                            restored = restore_reports(to_restore)
+                            st.success(f"{restored} reports restored")
+                            st.rerun()
+                        else:
+                            st.error("Incorrect password!")
+
+            # Display one page of the filtered reports in an organized table
+            if total_reports > 0:
                 st.subheader("All Reports Data")
 
                 # Group columns for better organization
                 column_groups = {
-                    "Basic Info": ['Date', 'VariantName', 'BatchCode', 'TotalCase', 'LooseCans', 'WIPCans'],
-                    "Rejection Info": [col for col in filtered_df.columns if 'Rejection' in col] + ['RejectShipper'],
+                    "Complete View": None,
+                    "Basic Info": ['Date', 'VariantName', 'BatchCode', 'TotalCase', 'LooseCans', 'WIPCans', 'TotalCans', 'Yield'],
+                    "Rejection Info": [col for col in COLUMNS if 'Rejection' in col] + ['RejectShipper', 'TotalRejections', 'RejectionRate'],
                     "QA Info": ['QASample', 'QAOtherSample', 'EmptySample']
                 }
 
-                # Create tabs for different views
-                tabs = st.tabs(["Complete View"] + list(column_groups.keys()))
+                # Only the selected view is fetched and rendered
+                view_col, size_col, page_col = st.columns([2, 1, 1])
+                with view_col:
+                    view = st.radio("View", list(column_groups.keys()), horizontal=True)
+                with size_col:
+                    page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1)
+                page_count = max(1, -(-total_reports // page_size))
+                with page_col:
+                    page_number = st.number_input("Page", min_value=1, max_value=page_count, value=1)
 
-                # Complete view tab
-                with tabs[0]:
-                    st.dataframe(
-                        filtered_df,
-                        hide_index=True,
-                        use_container_width=True,
-                        column_config={
-                            "Date": st.column_config.DateColumn("Date", help="Report date"),
-                            "VariantName": st.column_config.TextColumn("Variant Name", help="Product variant name", width="medium"),
-                            "BatchCode": st.column_config.TextColumn("Batch Code", help="Production batch code", width="medium"),
-                            "TotalCase": st.column_config.NumberColumn("Total Cases", help="Number of total cases", format="%d"),
-                            "LooseCans": st.column_config.NumberColumn("Loose Cans", help="Number of loose cans", format="%d"),
-                            "EmptyRejection": st.column_config.NumberColumn("Empty Rej.", help="Empty can rejections", format="%d"),
-                            "FilledRejection": st.column_config.NumberColumn("Filled Rej.", help="Filled can rejections", format="%d"),
-                            "QASample": st.column_config.NumberColumn("QA Samples", help="Quality assurance samples", format="%d"),
-                        },
-                        height=400
-                    )
-
-                # Group-specific tabs
-                for idx, (group_name, columns) in enumerate(column_groups.items(), 1):
-                    with tabs[idx]:
-                        st.dataframe(
-                            filtered_df[columns],
-                            hide_index=True,
-                            use_container_width=True
-                        )
+                page_df = add_metrics(query_page(
+                    **filters,
+                    offset=(page_number - 1) * page_size,
+                    limit=page_size
+                ))
+                columns = column_groups[view]
+                st.dataframe(
+                    page_df if columns is None else page_df[columns],
+                    hide_index=True,
+                    use_container_width=True,
+                    column_config={
+                        "Date": st.column_config.DateColumn("Date", help="Report date"),
+                        "VariantName": st.column_config.TextColumn("Variant Name", help="Product variant name", width="medium"),
+                        "BatchCode": st.column_config.TextColumn("Batch Code", help="Production batch code", width="medium"),
+                        "TotalCase": st.column_config.NumberColumn("Total Cases", help="Number of total cases", format="%d"),
+                        "LooseCans": st.column_config.NumberColumn("Loose Cans", help="Number of loose cans", format="%d"),
+                        "EmptyRejection": st.column_config.NumberColumn("Empty Rej.", help="Empty can rejections", format="%d"),
+                        "FilledRejection": st.column_config.NumberColumn("Filled Rej.", help="Filled can rejections", format="%d"),
+                        "QASample": st.column_config.NumberColumn("QA Samples", help="Quality assurance samples", format="%d"),
+                        "TotalCans": st.column_config.NumberColumn("Total Cans", help="Cases, loose cans, rejections and samples", format="%d"),
+                        "RejectionRate": st.column_config.NumberColumn("Rejection %", help="Rejections as a share of total cans", format="%.2f%%"),
+                        "Yield": st.column_config.NumberColumn("Yield %", help="Cases and loose cans as a share of total cans", format="%.2f%%"),
+                    } if columns is None else None,
+                    height=400
+                )
+                first_row = (page_number - 1) * page_size + 1
+                st.caption(f"Showing reports {first_row}-{first_row + len(page_df) - 1} of {total_reports}")
 
-            # Export buttons columns
+            # Export buttons columns, exports load the full filtered set only when asked for
             col1, col2 = st.columns(2)
+            export_params = {
+                "start_date": start_date,
+                "end_date": end_date,
+                "batch_code": filters["batch_code"],
+                "variant_name": filters["variant_name"],
+                "case_sensitive": filters["case_sensitive"]
+            }
+            version = data_version()
 
             # CSV Export
             with col1:
-                csv = filtered_df.to_csv(index=False)
-                st.download_button(
-                    label="Download CSV",
-                    data=csv,
-                    file_name=f"production_report_{start_date}_to_{end_date}.csv",
-                    mime="text/csv"
-                )
+                csv = get_export("csv", export_params, version)
+                if csv is None and st.button("Prepare CSV"):
+                    csv = get_or_create_export(
+                        "csv", export_params, version,
+                        lambda: query_data(**filters).to_csv(index=False)
+                    )
+                if csv is not None:
+                    st.download_button(
+                        label="Download CSV",
+                        data=csv,
+                        file_name=f"production_report_{start_date}_to_{end_date}.csv",
+                        mime="text/csv"
+                    )
 
             # PDF Export
             with col2:
-                pdf = create_pdf_report(filtered_df, start_date, end_date)
-                st.download_button(
-                    label="Download PDF Report",
-                    data=pdf,
-                    file_name=f"production_report_{start_date}_to_{end_date}.pdf",
-                    mime="application/pdf"
-                )
+                pdf_layout = st.radio("PDF layout", PDF_LAYOUTS, horizontal=True)
+                pdf_mode = PDF_LAYOUTS[pdf_layout]
+                pdf_params = {**export_params, "mode": pdf_mode}
+                pdf = get_export("pdf", pdf_params, version)
+                if pdf is None and st.button("Prepare PDF Report"):
+                    # ReportLab is only loaded when a PDF is actually built
+                    from pdf_generator import create_pdf_report
+                    with st.spinner("Generating PDF..."):
+                        pdf = get_or_create_export(
+                            "pdf", pdf_params, version,
+                            lambda: create_pdf_report(query_data(**filters), start_date, end_date, mode=pdf_mode)
+                        )
+                if pdf is not None:
+                    st.download_button(
+                        label="Download PDF Report",
+                        data=pdf,
+                        file_name=f"production_{pdf_mode}_{start_date}_to_{end_date}.pdf",
+                        mime="application/pdf"
+                    )
         else:
             st.info("No reports available")
 
+    elif page == "Bulk Import":
+        st.header("Bulk Import Shift Sheets")
+        st.markdown(f"Upload a CSV or Excel file with the columns: {', '.join(ENTRY_COLUMNS)}")
+
+        uploaded = st.file_uploader("Shift sheet", type=["csv", "xlsx"])
+        dry_run = st.checkbox("Validate only (do not save)")
+        if uploaded is not None and st.button("Import"):
+            suffix = os.path.splitext(uploaded.name)[1]
+            with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+                tmp.write(uploaded.getbuffer())
+            try:
+                with st.spinner("Importing..."):
+                    summary = import_file(tmp.name, dry_run=dry_run)
+            except (ValueError, ImportError) as e:
+                st.error(str(e))
+            else:
+                action = "validated" if dry_run else "imported"
+                st.success(f"{summary['imported']} of {summary['rows']} rows {action}")
+                if summary["rejected"]:
+                    st.warning(f"{summary['rejected']} rows rejected")
+                    st.dataframe(pd.DataFrame(summary["errors"]), hide_index=True, use_container_width=True)
+            finally:
+                os.remove(tmp.name)
+
     else:  # Analytics page
         st.header("Production Analytics")
 
-        df = load_data()
-        if df is not None and not df.empty:
-            # Daily production chart
-            st.subheader("Daily Production Overview")
-            fig_daily = create_daily_production_chart(df)
+        # Plotly is only loaded once someone opens Analytics
+        from visualizations import (
+            create_rejection_summary_chart, create_daily_production_chart, create_pareto_chart,
+            create_rejection_trend_chart, PERIOD_LABELS
+        )
+
+        # Pre-aggregated per date x variant sums instead of the raw reports
+        rollup = load_rollup()
+        if not rollup.empty:
+            # Production chart, bucketed so long ranges stay within MAX_CHART_POINTS
+            st.subheader("Production Overview")
+            choice = st.selectbox("Granularity", ["Auto"] + [name.title() for name in GRANULARITIES])
+            requested = None if choice == "Auto" else choice.lower()
+            bucketed, granularity, merged = bucket_rollup(rollup, requested)
+            if requested and granularity != requested:
+                st.caption(
+                    f"Showing {PERIOD_LABELS[granularity][0].lower()} totals: "
+                    f"{PERIOD_LABELS[requested][0].lower()} bars would exceed {MAX_CHART_POINTS} points"
+                )
+            if merged:
+                st.caption(
+                    f"The {merged} lowest-producing variants are combined as \"{OTHER_VARIANTS}\" "
+                    f"to stay within {MAX_CHART_POINTS} points"
+                )
+            fig_daily = create_daily_production_chart(bucketed, granularity)
             st.plotly_chart(fig_daily)
 
             # Rejection analysis
             st.subheader("Rejection Analysis")
-            fig_rejection = create_rejection_summary_chart(df)
+            fig_rejection = create_rejection_summary_chart(rollup)
             st.plotly_chart(fig_rejection)
 
+            # Pareto, rates and trends all come from one cached grouped pass
+            analytics = load_rejection_analytics()
+            variants = [str(name) for name in analytics.by_variant.index if pd.notna(name)]
+
+            st.subheader("Rejection Pareto")
+            scope = st.radio("Scope", ["All Reports", "Variant", "Batch"], horizontal=True)
+            if scope == "Variant" and variants:
+                pareto_variant = st.selectbox("Variant", variants, key="pareto_variant")
+                pareto, pareto_title = analytics.pareto(variant=pareto_variant), f"Rejection Pareto: {pareto_variant}"
+            elif scope == "Batch":
+                pareto_batch = st.text_input("Batch Code", key="pareto_batch").strip()
+                pareto, pareto_title = analytics.pareto(batch=pareto_batch), f"Rejection Pareto: batch {pareto_batch}"
+            else:
+                pareto, pareto_title = analytics.pareto(), "Rejection Pareto"
+            st.plotly_chart(create_pareto_chart(pareto, pareto_title))
+
+            st.subheader("Rejections per 1,000 Cans")
+            st.dataframe(
+                analytics.by_variant[["TotalCans", "TotalRejections", "RatePer1000"]]
+                .sort_values("RatePer1000", ascending=False).round(2)
+            )
+
+            st.subheader("Rejection Trends")
+            trend_variant = st.selectbox("Trend for", ["All Variants"] + variants, key="trend_variant")
+            trends = analytics.trends(None if trend_variant == "All Variants" else trend_variant)
+            st.plotly_chart(create_rejection_trend_chart(trends))
+
             # Summary statistics
             st.subheader("Production Summary")
-            summary = df.groupby("VariantName").agg({
-                "TotalCase": "sum",
-                "EmptyRejection": "sum",
-                "FilledRejection": "sum",
-                "QASample": "sum"
-            }).round(2)
+            summary = group_metrics(rollup, "VariantName")[[
+                "TotalCase", "EmptyRejection", "FilledRejection", "QASample",
+                "TotalCans", "TotalRejections", "RejectionRate", "Yield"
+            ]].round(2)
             st.dataframe(summary)
         else:
             st.info("No data available for analytics")
@@ -0,0 +1,17 @@
+import argparse
+import data_handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Move older reports from the CSV file into compressed monthly archives")
+    parser.add_argument("--hot-months", type=int, default=data_handler.HOT_MONTHS,
+                        help="Months, counting the current one, to keep in the hot file")
+    args = parser.parse_args()
+
+    if data_handler.STORAGE_BACKEND != "csv":
+        print(f"Nothing to archive: {data_handler.STORAGE_BACKEND} storage already reads by date range")
+        return
+    moved = data_handler.archive_storage(args.hot_months)
+    print(f"Archived {moved} reports dated before {data_handler.archive_cutoff(args.hot_months)} to {data_handler.ARCHIVE_DIR}")
+
+if __name__ == "__main__":
+    main()
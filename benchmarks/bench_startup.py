@@ -0,0 +1,74 @@
+"""Cold import time of app.py
+
+Each run imports the app in a fresh interpreter, so nothing is cached in
+sys.modules. Exits non-zero when the median exceeds --max-seconds or when a
+heavy rendering module is loaded at import time.
+
+    python benchmarks/bench_startup.py --runs 5 --max-seconds 3
+"""
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Must only be imported once Analytics or a PDF export needs them.
+# streamlit itself loads plotly.graph_objects, so plotly.express is the marker.
+LAZY_MODULES = ["plotly.express", "reportlab.platypus", "visualizations", "pdf_generator"]
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (LAZY_MODULES,)
+
+def measure_once():
+    """Import app.py in a new interpreter and return (seconds, eagerly loaded modules)"""
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    return result["seconds"], result["loaded"]
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import time of app.py")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to time")
+    parser.add_argument("--max-seconds", type=float, help="Fail when the median import time exceeds this")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args()
+
+    timings, loaded = [], set()
+    for _ in range(args.runs):
+        seconds, eager = measure_once()
+        timings.append(seconds)
+        loaded.update(eager)
+
+    result = {
+        "median_seconds": round(statistics.median(timings), 4),
+        "min_seconds": round(min(timings), 4),
+        "max_seconds": round(max(timings), 4),
+        "eager_heavy_modules": sorted(loaded),
+    }
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print(f"app.py cold import: median {result['median_seconds']}s "
+              f"(min {result['min_seconds']}s, max {result['max_seconds']}s, {args.runs} runs)")
+
+    failed = False
+    if loaded:
+        print(f"FAIL: imported at startup: {', '.join(sorted(loaded))}")
+        failed = True
+    if args.max_seconds is not None and result["median_seconds"] > args.max_seconds:
+        print(f"FAIL: median import time above {args.max_seconds}s")
+        failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""Wall time and peak memory of the data, chart and PDF entry points
+
+Runs entirely offline against synthetic data in a temporary directory:
+
+    python benchmarks/run_benchmarks.py --scales 1k 100k --output before.json
+    python benchmarks/run_benchmarks.py --scales 1k 100k --compare before.json
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import tracemalloc
+from datetime import date
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import data_handler
+from storage import SQLiteStorage, ParquetStorage, migrate_csv
+from synthetic import SCALES, generate_reports, parse_rows
+
+def _measure(fn, repeat, setup=None):
+    """Median wall time over repeat runs, then peak traced memory of one more run
+
+    setup, when given, runs untimed before each run.
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    if setup:
+        setup()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"seconds": round(statistics.median(timings), 6), "peak_mb": round(peak / 2**20, 3)}
+
+def _cold_load():
+    data_handler.invalidate_cache()
+    return data_handler.load_data()
+
+def benchmark_scale(rows, backend, repeat, pdf_rows):
+    """Run every benchmark against a fresh synthetic dataset of the given size"""
+    from visualizations import create_daily_production_chart, create_rejection_summary_chart
+    from pdf_generator import create_pdf_report
+
+    raw = generate_reports(rows)
+    os.makedirs("data", exist_ok=True)
+    raw.to_csv(data_handler.DATA_FILE, index=False)
+    if backend == "sqlite":
+        migrate_csv(data_handler.DATA_FILE, SQLiteStorage(data_handler.SQLITE_FILE))
+    elif backend == "parquet":
+        migrate_csv(data_handler.DATA_FILE, ParquetStorage(data_handler.PARQUET_DIR))
+    data_handler.STORAGE_BACKEND = backend
+    data_handler.invalidate_cache()
+
+    df = data_handler.load_data()
+    dates = df["Date"].dropna()
+    start, end = dates.min(), dates.min() + (dates.max() - dates.min()) / 10
+    variant = raw["VariantName"].iloc[0]
+    record = raw.iloc[0].to_dict()
+    record["BatchCode"] = "BENCH-0001"
+    record["Date"] = date.today()
+
+    results = {}
+    results["load_data"] = _measure(_cold_load, repeat)
+    results["search_data"] = _measure(
+        lambda: data_handler.search_data(df, start, end, variant_name=variant), repeat
+    )
+    results["create_daily_production_chart"] = _measure(lambda: create_daily_production_chart(df), repeat)
+    results["create_rejection_summary_chart"] = _measure(lambda: create_rejection_summary_chart(df), repeat)
+    pdf_df = df.head(pdf_rows)
+    results[f"create_pdf_report[{len(pdf_df)}]"] = _measure(
+        lambda: create_pdf_report(pdf_df, start, end), repeat
+    )
+    results["save_data"] = _measure(lambda: data_handler.save_data(record), repeat)
+    # Each delete needs a row to remove, so the row is saved again before every run
+    results["delete_report"] = _measure(
+        lambda: data_handler.delete_report(data_handler.load_data(), batch_code="BENCH-0001"), repeat,
+        setup=lambda: data_handler.save_data(record)
+    )
+    return results
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def _print_results(report, baseline=None):
+    for scale, results in report["results"].items():
+        print(f"\n{scale} rows ({report['backend']})")
+        print(f"  {'function':<36}{'seconds':>12}{'peak MB':>12}")
+        for name, result in results.items():
+            line = f"  {name:<36}{result['seconds']:>12.4f}{result['peak_mb']:>12.2f}"
+            previous = (baseline or {}).get("results", {}).get(scale, {}).get(name)
+            if previous and previous["seconds"]:
+                line += f"   x{result['seconds'] / previous['seconds']:.2f} vs {baseline.get('commit')}"
+            print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark data_handler, visualizations and pdf_generator")
+    parser.add_argument("--scales", nargs="+", default=["1k", "100k"], help="Row counts or " + ", ".join(SCALES))
+    parser.add_argument("--backend", choices=["csv", "sqlite", "parquet"], default="csv")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per function")
+    parser.add_argument("--pdf-rows", type=int, default=100, help="Records rendered in the PDF benchmark")
+    parser.add_argument("--output", help="Write results as JSON for later --compare")
+    parser.add_argument("--compare", help="JSON results from an earlier run to compare against")
+    args = parser.parse_args()
+
+    report = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "backend": args.backend,
+        "results": {},
+    }
+    workdir = tempfile.mkdtemp(prefix="rtd-bench-")
+    cwd = os.getcwd()
+    try:
+        for scale in args.scales:
+            rows = parse_rows(scale)
+            scale_dir = os.path.join(workdir, str(rows))
+            os.makedirs(scale_dir)
+            os.chdir(scale_dir)
+            report["results"][str(rows)] = benchmark_scale(rows, args.backend, args.repeat, args.pdf_rows)
+            os.chdir(cwd)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    _print_results(report, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
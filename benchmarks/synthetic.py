@@ -0,0 +1,75 @@
+"""Synthetic production reports for benchmarks
+
+    python benchmarks/synthetic.py --rows 100000 --output /tmp/reports.csv
+"""
+import argparse
+import numpy as np
+import pandas as pd
+
+VARIANTS = [
+    "Choco Latte", "Caramel Latte", "Vanilla Latte", "Hazelnut Latte",
+    "Mocha", "Espresso", "Cold Brew", "Iced Americano"
+]
+
+# Mean count per report for each column, roughly matching real shift sheets
+MEANS = {
+    "TotalCase": 1900, "LooseCans": 15, "EmptyRejection": 300, "EmptySample": 1000,
+    "WIPCans": 3000, "FilledRejection": 55, "BreakdownRejection": 35,
+    "ManpowerDentRejection": 22, "HighPressureRejection": 2, "WaterCanRejection": 5,
+    "MachineDentCans": 11, "FadeCans": 1, "UnprintedCans": 1, "ScratchedCans": 1,
+    "LidRejection": 35, "QASample": 160, "QAOtherSample": 200, "RejectShipper": 8,
+}
+
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+def parse_rows(value):
+    """Row count from a plain number or a k/m suffixed size such as 20k or 1m"""
+    value = value.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+    if multiplier > 1:
+        value = value[:-1]
+    return int(float(value) * multiplier)
+
+def generate_reports(rows, start_date="2020-01-01", reports_per_day=6, seed=0):
+    """Return a raw reports frame of the given size with realistic distributions
+
+    Dates advance one day every reports_per_day rows. Each report gets a
+    variant (skewed towards the first few), a unique batch code and counts
+    drawn per column: production volumes are normal around their mean,
+    rejections are Poisson so most are small with occasional spikes.
+    """
+    rng = np.random.default_rng(seed)
+    days = np.arange(rows) // reports_per_day
+    dates = pd.Timestamp(start_date) + pd.to_timedelta(days, unit="D")
+
+    weights = 1 / np.arange(1, len(VARIANTS) + 1)
+    variant_index = rng.choice(len(VARIANTS), size=rows, p=weights / weights.sum())
+    batch_codes = pd.Series(50700000 + np.arange(rows)).astype(str) + "AA"
+
+    data = {
+        "Date": dates.strftime("%Y-%m-%d"),
+        "VariantName": np.array(VARIANTS)[variant_index],
+        "BatchCode": batch_codes.to_numpy(),
+    }
+    for col, mean in MEANS.items():
+        if mean >= 500:
+            values = rng.normal(mean, mean * 0.15, size=rows).round()
+        else:
+            # Rare bad shifts multiply rejections
+            values = rng.poisson(mean, size=rows) * np.where(rng.random(rows) < 0.02, 5, 1)
+        data[col] = np.clip(values, 0, None).astype(np.int64)
+    return pd.DataFrame(data)
+
+def main():
+    parser = argparse.ArgumentParser(description="Write synthetic production reports to a CSV file")
+    parser.add_argument("--rows", default="1k", help="Row count or one of: " + ", ".join(SCALES))
+    parser.add_argument("--output", required=True, help="CSV file to write")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    args = parser.parse_args()
+
+    rows = parse_rows(args.rows)
+    generate_reports(rows, seed=args.seed).to_csv(args.output, index=False)
+    print(f"Wrote {rows} reports to {args.output}")
+
+if __name__ == "__main__":
+    main()
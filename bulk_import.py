@@ -0,0 +1,144 @@
+import os
+import argparse
+import pandas as pd
+from schema import ENTRY_COLUMNS, COUNT_COLUMNS, MAX_COUNT
+from data_handler import save_many, query_data
+
+# Rows validated and committed per batch
+BATCH_SIZE = 5000
+
+# Bad rows kept for display; the rest are only counted
+MAX_REPORTED_ERRORS = 1000
+
+def _read_csv_chunks(path, batch_size):
+    """Stream a CSV file as dataframes of batch_size rows"""
+    yield from pd.read_csv(path, chunksize=batch_size, dtype=str, keep_default_na=False)
+
+def _read_excel_chunks(path, batch_size):
+    """Stream the first sheet of an Excel workbook as dataframes of batch_size rows"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportError("Excel import needs openpyxl; install the 'excel' extra") from None
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(value).strip() if value is not None else "" for value in next(rows, [])]
+        batch = []
+        for values in rows:
+            batch.append(["" if value is None else value for value in values])
+            if len(batch) == batch_size:
+                yield pd.DataFrame(batch, columns=header)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=header)
+    finally:
+        workbook.close()
+
+def read_chunks(path, batch_size=BATCH_SIZE):
+    """Stream a CSV or Excel shift sheet in chunks without loading the whole file"""
+    if os.path.splitext(path)[1].lower() in (".xlsx", ".xlsm"):
+        return _read_excel_chunks(path, batch_size)
+    return _read_csv_chunks(path, batch_size)
+
+def validate_chunk(chunk, seen_keys, first_row):
+    """Split a chunk into valid records and a list of row errors
+
+    seen_keys holds the (date, batch code) pairs already stored or imported
+    and is updated with the pairs accepted from this chunk. first_row is the
+    spreadsheet row number of the chunk's first data row.
+    """
+    missing = [col for col in ENTRY_COLUMNS if col not in chunk.columns]
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(missing)}")
+
+    chunk = chunk[ENTRY_COLUMNS].reset_index(drop=True)
+    problems = [[] for _ in range(len(chunk))]
+
+    def flag(mask, message):
+        for position in mask[mask].index:
+            problems[position].append(message)
+
+    dates = pd.to_datetime(chunk["Date"], errors="coerce")
+    flag(dates.isna(), "Date is not a valid date")
+    for col in ("VariantName", "BatchCode"):
+        chunk[col] = chunk[col].astype(str).str.strip()
+        flag(chunk[col] == "", f"{col} is empty")
+
+    counts = {}
+    for col in COUNT_COLUMNS:
+        raw = chunk[col].replace("", 0)
+        values = pd.to_numeric(raw, errors="coerce")
+        flag(values.isna(), f"{col} is not a number")
+        flag(values < 0, f"{col} is negative")
+        flag(values > MAX_COUNT, f"{col} is larger than {MAX_COUNT:,}")
+        flag(values.notna() & (values % 1 != 0), f"{col} is not a whole number")
+        counts[col] = values
+
+    records = []
+    for position in range(len(chunk)):
+        key = (dates[position], chunk.at[position, "BatchCode"])
+        if not problems[position] and key in seen_keys:
+            problems[position].append("Duplicate Date and BatchCode")
+        if problems[position]:
+            continue
+        seen_keys.add(key)
+        record = {
+            "Date": dates[position].date(),
+            "VariantName": chunk.at[position, "VariantName"],
+            "BatchCode": chunk.at[position, "BatchCode"],
+        }
+        record.update({col: int(counts[col][position]) for col in COUNT_COLUMNS})
+        records.append(record)
+
+    errors = [
+        {"Row": first_row + position, "Errors": "; ".join(messages)}
+        for position, messages in enumerate(problems) if messages
+    ]
+    return records, errors
+
+def existing_keys():
+    """(date, batch code) pairs already in storage"""
+    stored = query_data(columns=["Date", "BatchCode"])
+    return set(zip(stored["Date"], stored["BatchCode"].astype(str)))
+
+def import_file(path, batch_size=BATCH_SIZE, dry_run=False):
+    """Validate and import a shift sheet batch by batch
+
+    Returns a summary with the number of rows read and imported, the number
+    of rejected rows and the first MAX_REPORTED_ERRORS row errors.
+    """
+    seen_keys = existing_keys()
+    summary = {"rows": 0, "imported": 0, "rejected": 0, "errors": []}
+    for chunk in read_chunks(path, batch_size):
+        # Spreadsheet row numbers: row 1 is the header
+        records, errors = validate_chunk(chunk, seen_keys, first_row=summary["rows"] + 2)
+        summary["rows"] += len(chunk)
+        summary["rejected"] += len(errors)
+        summary["errors"].extend(errors[:MAX_REPORTED_ERRORS - len(summary["errors"])])
+        if records and not dry_run:
+            save_many(records)
+        summary["imported"] += len(records)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Import historical shift sheets (CSV or Excel) into storage")
+    parser.add_argument("path", help="CSV or .xlsx file with the report columns")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Rows validated and saved per batch")
+    parser.add_argument("--dry-run", action="store_true", help="Validate only, do not save")
+    parser.add_argument("--errors", help="Write rejected rows to this CSV file")
+    args = parser.parse_args()
+
+    summary = import_file(args.path, args.batch_size, args.dry_run)
+    action = "Validated" if args.dry_run else "Imported"
+    print(f"{action} {summary['imported']} of {summary['rows']} rows, rejected {summary['rejected']}")
+    if args.errors and summary["errors"]:
+        pd.DataFrame(summary["errors"]).to_csv(args.errors, index=False)
+        print(f"Rejected rows written to {args.errors}")
+    else:
+        for error in summary["errors"][:20]:
+            print(f"  row {error['Row']}: {error['Errors']}")
+
+if __name__ == "__main__":
+    main()
@@ -1,78 +1,466 @@
 import pandas as pd
 import os
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime, date
+from schema import COLUMNS, ID_COLUMN, TEXT_DTYPES, apply_schema, assign_report_ids, empty_frame
+from storage import CSVStorage, SQLiteStorage, ParquetStorage, file_lock, write_atomic
+from rollup import build_rollup, empty_rollup, read_rollup, write_rollup, append_rollup, stamp_rollup, rollup_version
+from profiling import profiled
+from search_index import ReportIndex, parse_patterns, is_exact
+from rejections import RejectionAnalytics
 
 DATA_FILE = "data/reports.csv"
+SQLITE_FILE = "data/reports.db"
+PARQUET_DIR = "data/reports_parquet"
+ROLLUP_FILE = "data/rollup.csv"
+
+# Monthly gzip segments of older CSV reports; see archive_storage()
+ARCHIVE_DIR = "data/archive"
+
+# Months, counting the current one, that stay in the hot reports file
+HOT_MONTHS = 2
+
+# Written after each archive run so the app archives at most once a day
+ARCHIVE_MARKER = "data/archive/last_run"
+
+# Every deleted report with the time it was deleted, so deletes can be audited and undone
+DELETED_FILE = "data/deleted_reports.csv"
+
+# Rewrite CSV storage in the background once this many deleted rows are only tombstoned
+COMPACT_TOMBSTONES = 1000
+
+# Fold the rollup's appended deltas into its base file once they grow past this many bytes
+ROLLUP_COMPACT_BYTES = 1024 * 1024
+
+# Merge Parquet partitions in the background once appends leave this many extra files
+COMPACT_FRAGMENTS = 200
+
+# Select the storage backend with RTD_STORAGE=csv|sqlite|parquet (defaults to csv)
+STORAGE_BACKEND = os.environ.get("RTD_STORAGE", "csv")
+
+# Parsed frames are reused until storage changes; see data_generation()
+QUERY_CACHE_SIZE = 16
+_cache_lock = threading.Lock()
+_write_generation = 0
+_load_cache = {"key": None, "df": None, "index": None}
+_query_cache = OrderedDict()
+_rollup_cache = {"key": None, "df": None}
+_analytics_cache = {"key": None, "analytics": None}
+_compaction = {"thread": None}
+_archiving = {"thread": None}
+_deleted_cache = {"key": None, "df": None}
+
+def get_storage():
+    """Return the configured storage backend"""
+    if STORAGE_BACKEND == "sqlite":
+        return SQLiteStorage(SQLITE_FILE)
+    if STORAGE_BACKEND == "parquet":
+        return ParquetStorage(PARQUET_DIR)
+    if STORAGE_BACKEND == "csv":
+        return CSVStorage(DATA_FILE, ARCHIVE_DIR)
+    raise ValueError(f"Unknown storage backend: {STORAGE_BACKEND}")
+
+def data_version():
+    """Token for the stored data that stays the same across app restarts"""
+    storage = get_storage()
+    return (storage.name, storage.signature())
+
+def data_generation():
+    """Token identifying the current contents of storage"""
+    return data_version() + (_write_generation,)
+
+def invalidate_cache():
+    """Drop cached frames so the next load re-reads storage"""
+    global _write_generation
+    with _cache_lock:
+        _write_generation += 1
+        _load_cache["key"] = _load_cache["df"] = _load_cache["index"] = None
+        _rollup_cache["key"] = _rollup_cache["df"] = None
+        _analytics_cache["key"] = _analytics_cache["analytics"] = None
+        _deleted_cache["key"] = _deleted_cache["df"] = None
+        _query_cache.clear()
 
 def ensure_data_file():
     """Ensure the data directory and file exist"""
     os.makedirs("data", exist_ok=True)
-    if not os.path.exists(DATA_FILE):
-        pd.DataFrame(columns=[
-            "Date", "VariantName", "BatchCode", "TotalCase", 
-            "LooseCans", "EmptyRejection", "EmptySample", "WIPCans",
-            "FilledRejection", "BreakdownRejection", "ManpowerDentRejection",
-            "HighPressureRejection", "WaterCanRejection", "MachineDentCans",
-            "FadeCans", "UnprintedCans", "ScratchedCans", "LidRejection",
-            "QASample", "QAOtherSample", "RejectShipper"
-        ]).to_csv(DATA_FILE, index=False)
+    get_storage().ensure()
 
-def save_data(data):
-    """Save new data to CSV file"""
+@profiled()
+def save_many(records):
+    """Append a batch of records to storage without rewriting it"""
+    records = list(records)
+    if not records:
+        return 0
     ensure_data_file()
-    df = pd.read_csv(DATA_FILE)
-    new_df = pd.concat([df, pd.DataFrame([data])], ignore_index=True)
-    new_df.to_csv(DATA_FILE, index=False)
+    new_df = assign_report_ids(pd.DataFrame(records).reindex(columns=COLUMNS))
+    # Summarise before writing so rows that cannot be read back are never stored
+    added = build_rollup(apply_schema(new_df))
+    with file_lock(ROLLUP_FILE):
+        _ensure_rollup()
+        get_storage().append(new_df)
+        _add_to_rollup(added)
+    invalidate_cache()
+    _compact_if_due(get_storage())
+    return len(new_df)
 
+def save_data(data):
+    """Append a single new record to storage"""
+    save_many([data])
+
+@profiled()
 def load_data():
-    """Load data from CSV file"""
+    """Load data from storage, reusing the parsed frame while storage is unchanged
+
+    The returned frame is shared between callers and must not be modified in place.
+    """
+    key = data_generation()
+    with _cache_lock:
+        if _load_cache["key"] == key:
+            return _load_cache["df"]
     ensure_data_file()
+    key = data_generation()
     try:
-        df = pd.read_csv(DATA_FILE, parse_dates=['Date'])
-        df["Date"] = pd.to_datetime(df["Date"]).dt.date
-        numeric_columns = [
-            "TotalCase", "LooseCans", "EmptyRejection", 
-            "EmptySample", "WIPCans", "FilledRejection", "BreakdownRejection",
-            "ManpowerDentRejection", "HighPressureRejection", "WaterCanRejection",
-            "MachineDentCans", "FadeCans", "UnprintedCans", "ScratchedCans",
-            "LidRejection", "QASample", "QAOtherSample", "RejectShipper"
-        ]
-        for col in numeric_columns:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-        return df
+        df = apply_schema(get_storage().load())
     except pd.errors.EmptyDataError:
-        return pd.DataFrame()
+        df = empty_frame()
+    with _cache_lock:
+        _load_cache["key"] = key
+        _load_cache["df"] = df
+        _load_cache["index"] = None
+    return df
+
+def _report_index(df):
+    """Index over df, built once per data generation for the frame load_data returns"""
+    with _cache_lock:
+        if _load_cache["df"] is df and _load_cache["index"] is not None:
+            return _load_cache["index"]
+    index = ReportIndex(df)
+    with _cache_lock:
+        if _load_cache["df"] is df:
+            _load_cache["index"] = index
+    return index
+
+@profiled()
+def search_data(df, start_date=None, end_date=None, batch_code=None, variant_name=None, case_sensitive=True):
+    """Search and filter data
+
+    batch_code and variant_name take one value or a list of values, and a
+    value ending in * matches as a prefix (e.g. "50787*"). Only the matching
+    rows are copied; with no filters a copy of df is returned.
+    """
+    return _report_index(df).search(start_date, end_date, batch_code, variant_name, case_sensitive)
+
+def _filter_params(start_date, end_date, batch_code, variant_name):
+    """Normalise View Reports filters the same way search_data interprets them"""
+    if not (start_date and end_date):
+        start_date = end_date = None
+    return (start_date, end_date, parse_patterns(batch_code), parse_patterns(variant_name))
+
+def _pushdown_params(params, case_sensitive):
+    """Filters for storage.query/count, or None when only search_data can answer them"""
+    start_date, end_date, batch_codes, variant_names = params
+    if not case_sensitive or not (is_exact(batch_codes) and is_exact(variant_names)):
+        return None
+    return (start_date, end_date, batch_codes and batch_codes[0], variant_names and variant_names[0])
+
+def _cached_query(key, build):
+    """Result of build() reused while storage is unchanged"""
+    key = (data_generation(), key)
+    with _cache_lock:
+        if key in _query_cache:
+            _query_cache.move_to_end(key)
+            return _query_cache[key]
+    result = build()
+    with _cache_lock:
+        _query_cache[key] = result
+        while len(_query_cache) > QUERY_CACHE_SIZE:
+            _query_cache.popitem(last=False)
+    return result
+
+@profiled()
+def query_data(start_date=None, end_date=None, batch_code=None, variant_name=None, columns=None,
+               case_sensitive=True):
+    """Load only the matching reports, pushing filters and columns down to storage when it can
+
+    Lists, prefixes and case-insensitive matches are answered by search_data
+    over the loaded frame.
+    """
+    storage = get_storage()
+    params = _pushdown_params(_filter_params(start_date, end_date, batch_code, variant_name), case_sensitive)
+    if not storage.indexed or params is None:
+        df = search_data(load_data(), start_date, end_date, batch_code, variant_name, case_sensitive)
+        return df[list(columns)] if columns else df
+    ensure_data_file()
+    columns = tuple(columns) if columns else None
+    return _cached_query(
+        ("query", params, columns),
+        lambda: apply_schema(storage.query(*params, columns=columns), columns)
+    )
+
+@profiled()
+def count_data(start_date=None, end_date=None, batch_code=None, variant_name=None, case_sensitive=True):
+    """Number of matching reports, counted by storage without loading the rows when it can"""
+    storage = get_storage()
+    params = _pushdown_params(_filter_params(start_date, end_date, batch_code, variant_name), case_sensitive)
+    if not storage.indexed or params is None:
+        return len(search_data(load_data(), start_date, end_date, batch_code, variant_name, case_sensitive))
+    ensure_data_file()
+    return _cached_query(("count", params), lambda: storage.count(*params))
+
+@profiled()
+def query_page(start_date=None, end_date=None, batch_code=None, variant_name=None,
+               offset=0, limit=50, columns=None, case_sensitive=True):
+    """One page of matching reports, fetching only that slice from storage when it can"""
+    storage = get_storage()
+    params = _pushdown_params(_filter_params(start_date, end_date, batch_code, variant_name), case_sensitive)
+    if not storage.indexed or params is None:
+        df = query_data(start_date, end_date, batch_code, variant_name, columns, case_sensitive)
+        return df.iloc[offset:offset + limit]
+    ensure_data_file()
+    columns = tuple(columns) if columns else None
+    return _cached_query(
+        ("page", params, columns, offset, limit),
+        lambda: apply_schema(storage.query(*params, columns=columns, offset=offset, limit=limit), columns)
+    )
+
+def _version_token():
+    """data_version() in the JSON form stored next to the rollup"""
+    return json.loads(json.dumps(data_version()))
+
+def _store_rollup(rollup):
+    write_rollup(rollup, ROLLUP_FILE, _version_token())
+
+def _ensure_rollup():
+    """Rebuild the stored rollup if it does not match storage; call with the rollup lock held
+
+    Writers call this before changing storage so their delta is appended to
+    a rollup that is known to be correct. Only the meta file is read when it is.
+    """
+    if rollup_version(ROLLUP_FILE) != _version_token():
+        _store_rollup(build_rollup(load_data()))
 
-def search_data(df, start_date=None, end_date=None, batch_code=None, variant_name=None):
-    """Search and filter data"""
-    filtered_df = df.copy()
+def _add_to_rollup(delta, sign=1):
+    """Record a save (sign=1) or delete (sign=-1) in the rollup without rewriting it"""
+    append_rollup(delta, ROLLUP_FILE, _version_token(), sign)
 
-    if start_date and end_date:
-        filtered_df = filtered_df[
-            (filtered_df["Date"] >= start_date) & 
-            (filtered_df["Date"] <= end_date)
-        ]
+@profiled()
+def load_rollup():
+    """Per date x variant sums of every count column, maintained on save and delete
 
-    if batch_code:
-        filtered_df = filtered_df[filtered_df["BatchCode"] == batch_code]
+    Saves and deletes only append deltas, which are folded in here and
+    written back into the base file once they pass ROLLUP_COMPACT_BYTES.
+    Falls back to rebuilding from the raw reports when the stored rollup was
+    written for a different version of storage (e.g. after an external edit).
+    """
+    ensure_data_file()
+    key = data_generation()
+    with _cache_lock:
+        if _rollup_cache["key"] == key:
+            return _rollup_cache["df"]
+    with file_lock(ROLLUP_FILE):
+        rollup, version, deltas_size = read_rollup(ROLLUP_FILE)
+        if rollup is None or version != _version_token():
+            rollup = build_rollup(load_data())
+            _store_rollup(rollup)
+        elif deltas_size >= ROLLUP_COMPACT_BYTES:
+            _store_rollup(rollup)
+    with _cache_lock:
+        _rollup_cache["key"] = key
+        _rollup_cache["df"] = rollup
+    return rollup
+
+def has_reports():
+    """True when storage holds any report, answered from the rollup so archived history is not read"""
+    return not load_rollup().empty
+
+@profiled()
+def load_rejection_analytics():
+    """RejectionAnalytics over every report, computed once per data generation"""
+    key = data_generation()
+    with _cache_lock:
+        if _analytics_cache["key"] == key:
+            return _analytics_cache["analytics"]
+    analytics = RejectionAnalytics(load_data())
+    with _cache_lock:
+        _analytics_cache["key"] = key
+        _analytics_cache["analytics"] = analytics
+    return analytics
+
+def _match(df, date=None, batch_code=None, variant_name=None):
+    """Mask of rows matching all given filters"""
+    mask = pd.Series(True, index=df.index)
+    if date is not None:
+        mask &= (df["Date"] == pd.Timestamp(date))
+    if batch_code is not None:
+        mask &= (df["BatchCode"] == batch_code)
+    if variant_name is not None:
+        mask &= (df["VariantName"] == variant_name)
+    return mask
 
-    if variant_name:
-        filtered_df = filtered_df[filtered_df["VariantName"] == variant_name]
+def _archive_deleted(removed):
+    """Append deleted reports to DELETED_FILE with the time of deletion"""
+    archived = removed[COLUMNS].assign(DeletedAt=datetime.now().isoformat(timespec="seconds"))
+    header = not os.path.exists(DELETED_FILE)
+    archived.to_csv(DELETED_FILE, mode="a", header=header, index=False, date_format="%Y-%m-%d")
 
-    return filtered_df
+def _prime_load_cache(df):
+    """Cache a frame already known to match storage so the next load skips parsing"""
+    key = data_generation()
+    with _cache_lock:
+        _load_cache["key"] = key
+        _load_cache["df"] = df
+        _load_cache["index"] = None
 
+@profiled()
 def delete_report(df, date=None, batch_code=None, variant_name=None, delete_all=False):
-    """Delete reports based on filters or delete all"""
+    """Delete reports based on filters or delete all
+
+    Deleted reports are archived in DELETED_FILE and can be brought back with
+    restore_reports. CSV storage only records tombstones for the deleted IDs;
+    the file is rewritten in the background once COMPACT_TOMBSTONES pile up.
+    """
+    storage = get_storage()
     if delete_all:
-        df = pd.DataFrame(columns=df.columns)
-    else:
-        mask = pd.Series(True, index=df.index)
-        if date is not None:
-            mask &= (df["Date"] == date)
-        if batch_code is not None:
-            mask &= (df["BatchCode"] == batch_code)
-        if variant_name is not None:
-            mask &= (df["VariantName"] == variant_name)
-        df = df[~mask]
-    
-    df.to_csv(DATA_FILE, index=False)
-    return df
\ No newline at end of file
+        with file_lock(ROLLUP_FILE):
+            current = load_data()
+            if not current.empty:
+                _archive_deleted(current)
+            storage.delete_all()
+            _store_rollup(empty_rollup())
+        invalidate_cache()
+        return empty_frame()
+
+    with file_lock(ROLLUP_FILE):
+        _ensure_rollup()
+        current = load_data()
+        mask = _match(current, date, batch_code, variant_name)
+        removed = current[mask]
+        if not removed.empty:
+            _archive_deleted(removed)
+            storage.delete_ids(removed[ID_COLUMN].tolist())
+            _add_to_rollup(build_rollup(removed), sign=-1)
+            invalidate_cache()
+            # The remaining rows are exactly what a reload would return
+            _prime_load_cache(current[~mask].reset_index(drop=True))
+    _compact_if_due(storage)
+    return df[~_match(df, date, batch_code, variant_name)]
+
+def deleted_reports():
+    """Archived deleted reports with a DeletedAt column, oldest first
+
+    The frame is reused until storage changes and must not be modified in place.
+    """
+    key = data_generation()
+    with _cache_lock:
+        if _deleted_cache["key"] == key:
+            return _deleted_cache["df"]
+    try:
+        archived = pd.read_csv(DELETED_FILE, dtype=TEXT_DTYPES)
+        deleted_at = pd.to_datetime(archived["DeletedAt"], errors="coerce")
+        df = apply_schema(archived).assign(DeletedAt=deleted_at)
+    except (FileNotFoundError, pd.errors.EmptyDataError):
+        df = empty_frame().assign(DeletedAt=pd.Series(dtype="datetime64[ns]"))
+    with _cache_lock:
+        _deleted_cache["key"] = key
+        _deleted_cache["df"] = df
+    return df
+
+def restore_reports(report_ids):
+    """Bring archived deleted reports back into storage; returns how many were restored"""
+    report_ids = set(report_ids)
+    with file_lock(ROLLUP_FILE):
+        archived = deleted_reports()
+        selected = archived[ID_COLUMN].isin(report_ids)
+        # A report deleted, restored and deleted again is archived twice
+        restored = archived[selected].drop_duplicates(ID_COLUMN, keep="last")
+        restored = restored[~restored[ID_COLUMN].isin(load_data()[ID_COLUMN])]
+        if restored.empty:
+            return 0
+        _ensure_rollup()
+        get_storage().restore(restored[COLUMNS].assign(Date=restored["Date"].dt.strftime("%Y-%m-%d")))
+        _add_to_rollup(build_rollup(restored))
+        remaining = archived[~selected]
+        remaining = remaining.assign(
+            Date=remaining["Date"].dt.strftime("%Y-%m-%d"),
+            DeletedAt=remaining["DeletedAt"].dt.strftime("%Y-%m-%dT%H:%M:%S")
+        )
+        write_atomic(remaining, DELETED_FILE)
+    invalidate_cache()
+    return len(restored)
+
+def compact_storage():
+    """Drop tombstoned rows and merge appended files; returns how many rows were removed"""
+    with file_lock(ROLLUP_FILE):
+        _ensure_rollup()
+        before = data_version()
+        removed = get_storage().compact()
+        changed = data_version() != before
+        if changed:
+            # Same reports, new files: re-stamp the rollup so it is not rebuilt
+            stamp_rollup(ROLLUP_FILE, _version_token())
+    if changed:
+        invalidate_cache()
+    return removed
+
+def _compact_if_due(storage):
+    """Start background compaction once deletes or appended files pile up"""
+    if storage.tombstone_count() >= COMPACT_TOMBSTONES or storage.fragment_count() >= COMPACT_FRAGMENTS:
+        compact_in_background()
+
+def compact_in_background():
+    """Start compact_storage on a daemon thread unless one is already running"""
+    with _cache_lock:
+        thread = _compaction["thread"]
+        if thread is not None and thread.is_alive():
+            return thread
+        thread = threading.Thread(target=compact_storage, name="rtd-compaction", daemon=True)
+        _compaction["thread"] = thread
+    thread.start()
+    return thread
+
+def archive_cutoff(hot_months=None, today=None):
+    """First month (YYYY-MM) kept in the hot file"""
+    hot_months = HOT_MONTHS if hot_months is None else hot_months
+    month = pd.Period(today or date.today(), freq="M") - max(hot_months - 1, 0)
+    return str(month)
+
+def archive_storage(hot_months=None):
+    """Move reports older than the hot months into the compressed archive; returns how many moved"""
+    ensure_data_file()
+    with file_lock(ROLLUP_FILE):
+        _ensure_rollup()
+        moved = get_storage().archive(archive_cutoff(hot_months))
+        if moved:
+            # Same reports, new files: re-stamp the rollup so it is not rebuilt
+            stamp_rollup(ROLLUP_FILE, _version_token())
+    if moved:
+        invalidate_cache()
+    return moved
+
+def _archive_due():
+    try:
+        with open(ARCHIVE_MARKER) as f:
+            return f.read().strip() != date.today().isoformat()
+    except FileNotFoundError:
+        return True
+
+def _scheduled_archive():
+    archive_storage()
+    os.makedirs(os.path.dirname(ARCHIVE_MARKER), exist_ok=True)
+    with open(ARCHIVE_MARKER, "w") as f:
+        f.write(date.today().isoformat())
+
+def archive_in_background():
+    """Start archive_storage on a daemon thread if it has not run today and is not running"""
+    if STORAGE_BACKEND != "csv" or not _archive_due():
+        return None
+    with _cache_lock:
+        thread = _archiving["thread"]
+        if thread is not None and thread.is_alive():
+            return thread
+        thread = threading.Thread(target=_scheduled_archive, name="rtd-archive", daemon=True)
+        _archiving["thread"] = thread
+    thread.start()
+    return thread
@@ -0,0 +1,74 @@
+import os
+import json
+import hashlib
+from storage import replace_atomic
+
+EXPORT_CACHE_DIR = "data/export_cache"
+
+# Least recently used exports are evicted once the cache grows past this size
+EXPORT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+def cache_key(kind, params, version):
+    """Hash of the export kind, its filter parameters and the data version"""
+    payload = json.dumps([kind, params, version], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _path(kind, params, version):
+    return os.path.join(EXPORT_CACHE_DIR, f"{cache_key(kind, params, version)}.{kind}")
+
+def _write_bytes(path, content):
+    with open(path, "wb") as f:
+        f.write(content)
+
+def get_export(kind, params, version):
+    """Return cached export bytes, or None if this export has not been built"""
+    path = _path(kind, params, version)
+    try:
+        with open(path, "rb") as f:
+            content = f.read()
+    except FileNotFoundError:
+        return None
+    # Mark as recently used, unless it was evicted since the read
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+    return content
+
+def get_or_create_export(kind, params, version, build):
+    """Return cached export bytes, building and storing them on a miss"""
+    content = get_export(kind, params, version)
+    if content is not None:
+        return content
+
+    content = build()
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+    path = _path(kind, params, version)
+    replace_atomic(path, lambda tmp_path: _write_bytes(tmp_path, content))
+    evict_exports()
+    return content
+
+def evict_exports(max_bytes=EXPORT_CACHE_MAX_BYTES):
+    """Delete least recently used exports until the cache fits in max_bytes"""
+    if not os.path.isdir(EXPORT_CACHE_DIR):
+        return
+    entries = []
+    for entry in os.scandir(EXPORT_CACHE_DIR):
+        if entry.is_file() and not entry.name.endswith(".tmp"):
+            stat = entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+def clear_exports():
+    """Remove every cached export"""
+    evict_exports(max_bytes=0)
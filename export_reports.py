@@ -0,0 +1,88 @@
+"""Headless CSV/PDF export for scheduled jobs
+
+Example nightly cron entry:
+
+    python export_reports.py --yesterday --csv exports/{start}.csv --pdf exports/{start}.pdf
+
+Only pandas and the storage modules are imported up front; reportlab is
+loaded when a PDF is requested, and streamlit/plotly are never imported.
+"""
+import os
+import sys
+import argparse
+from datetime import date, timedelta
+from data_handler import query_data
+from storage import replace_atomic
+
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not a YYYY-MM-DD date: {value}")
+
+def _output_path(template, start_date, end_date):
+    """Fill {start}/{end} placeholders so several periods can run side by side"""
+    return template.format(start=start_date or "all", end=end_date or "all")
+
+def _replace_atomic(path, write):
+    """Create the target directory, then call write(tmp_path) and move the finished file into place"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    replace_atomic(path, write)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Export production reports to CSV and/or PDF without the web app")
+    period = parser.add_mutually_exclusive_group()
+    period.add_argument("--start", type=_parse_date, help="First report date (YYYY-MM-DD)")
+    period.add_argument("--yesterday", action="store_true", help="Export only yesterday's reports")
+    parser.add_argument("--end", type=_parse_date, help="Last report date (YYYY-MM-DD), defaults to --start")
+    parser.add_argument("--variant", action="append", help="Only this variant name (repeat for several)")
+    parser.add_argument("--batch", action="append", help="Only this batch code, or a prefix ending in * (repeatable)")
+    parser.add_argument("--ignore-case", action="store_true", help="Match variant names and batch codes in any case")
+    parser.add_argument("--csv", help="CSV output path; {start} and {end} are substituted")
+    parser.add_argument("--pdf", help="PDF output path; {start} and {end} are substituted")
+    parser.add_argument("--pdf-mode", choices=["detailed", "summary"], default="detailed",
+                        help="One page per report, or aggregated per-variant and per-day tables")
+    parser.add_argument("--workers", type=int, default=1, help="Processes used to render large detailed PDFs")
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not (args.csv or args.pdf):
+        parser.error("nothing to do: pass --csv and/or --pdf")
+
+    start_date, end_date = args.start, args.end or args.start
+    if args.yesterday:
+        start_date = end_date = date.today() - timedelta(days=1)
+    if end_date and not start_date:
+        parser.error("--end needs --start")
+
+    df = query_data(
+        start_date=start_date,
+        end_date=end_date,
+        batch_code=args.batch,
+        variant_name=args.variant,
+        case_sensitive=not args.ignore_case
+    )
+    print(f"{len(df)} reports from {start_date or 'the beginning'} to {end_date or 'today'}")
+
+    if args.csv:
+        path = _output_path(args.csv, start_date, end_date)
+        _replace_atomic(path, lambda tmp_path: df.to_csv(tmp_path, index=False))
+        print(f"Wrote {path}")
+
+    if args.pdf:
+        from pdf_generator import write_pdf_report, write_pdf_report_parallel, write_summary_pdf_report
+        path = _output_path(args.pdf, start_date, end_date)
+        if args.pdf_mode == "summary":
+            write = lambda tmp_path: write_summary_pdf_report(df, start_date, end_date, tmp_path)
+        elif args.workers > 1:
+            write = lambda tmp_path: write_pdf_report_parallel(df, start_date, end_date, tmp_path, args.workers)
+        else:
+            write = lambda tmp_path: write_pdf_report(df, start_date, end_date, tmp_path)
+        _replace_atomic(path, write)
+        print(f"Wrote {path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+from schema import COUNT_COLUMNS, REJECTION_COLUMNS, GOOD_CAN_COLUMNS, TOTAL_CAN_COLUMNS
+
+METRIC_COLUMNS = ["TotalCans", "TotalRejections", "RejectionRate", "Yield"]
+
+def _column_sum(df, columns):
+    """Row-wise sum of count columns as one int64 array"""
+    return df[columns].to_numpy(dtype=np.int64, na_value=0).sum(axis=1)
+
+def _ratio(part, whole, scale):
+    """part * scale / whole, 0 where whole is 0"""
+    part = np.asarray(part, dtype=np.float64)
+    whole = np.asarray(whole, dtype=np.float64)
+    return np.divide(part * scale, whole, out=np.zeros_like(part), where=whole != 0)
+
+def _percent(part, whole):
+    """part / whole as a percentage, 0 where whole is 0"""
+    return _ratio(part, whole, 100)
+
+def total_cans(df):
+    """Total cans per report including all rejections and samples"""
+    return pd.Series(_column_sum(df, TOTAL_CAN_COLUMNS), index=df.index, name="TotalCans")
+
+def total_rejections(df):
+    """Rejected cans per report, summed over every rejection column"""
+    return pd.Series(_column_sum(df, REJECTION_COLUMNS), index=df.index, name="TotalRejections")
+
+def rejections_per_thousand(rejections, cans):
+    """Rejections per 1,000 cans, 0 where there are no cans"""
+    return _ratio(rejections, cans, 1000)
+
+def add_metrics(df):
+    """Return a copy of df with TotalCans, TotalRejections, RejectionRate and Yield per row
+
+    RejectionRate and Yield are percentages of TotalCans.
+    """
+    totals = _column_sum(df, TOTAL_CAN_COLUMNS)
+    rejections = _column_sum(df, REJECTION_COLUMNS)
+    good = _column_sum(df, GOOD_CAN_COLUMNS)
+    return df.assign(
+        TotalCans=totals,
+        TotalRejections=rejections,
+        RejectionRate=_percent(rejections, totals),
+        Yield=_percent(good, totals),
+    )
+
+def group_metrics(df, by):
+    """Sum every count column per group and derive the same metrics from the sums"""
+    sums = df.groupby(by, observed=True)[COUNT_COLUMNS].sum()
+    return add_metrics(sums)
@@ -0,0 +1,24 @@
+import argparse
+from storage import SQLiteStorage, ParquetStorage, migrate_csv
+
+TARGETS = {
+    "sqlite": (SQLiteStorage, "data/reports.db"),
+    "parquet": (ParquetStorage, "data/reports_parquet"),
+}
+
+def main():
+    parser = argparse.ArgumentParser(description="Copy reports from the CSV file into another storage backend")
+    parser.add_argument("--source", default="data/reports.csv", help="Reports CSV to read")
+    parser.add_argument("--archive", default="data/archive", help="Directory of archived months to copy as well")
+    parser.add_argument("--to", dest="backend", choices=sorted(TARGETS), default="sqlite", help="Backend to write")
+    parser.add_argument("--target", help="Database file or dataset directory to write")
+    args = parser.parse_args()
+
+    storage_class, default_target = TARGETS[args.backend]
+    target = args.target or default_target
+    copied = migrate_csv(args.source, storage_class(target), archive_dir=args.archive)
+    print(f"Migrated {copied} reports from {args.source} to {target}")
+    print(f"Set RTD_STORAGE={args.backend} to use the new storage")
+
+if __name__ == "__main__":
+    main()
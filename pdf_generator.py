@@ -5,154 +5,343 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 import io
+import os
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 from datetime import datetime
+from metrics import total_cans as compute_total_cans, add_metrics
+from rollup import build_rollup, bucket_rollup, choose_granularity
+from schema import COUNT_COLUMNS, REJECTION_COLUMNS
+from profiling import profiled
 
-def calculate_total_cans(row):
-    """Calculate total cans including all rejections and samples"""
-    base_cans = row['TotalCase'] + row['LooseCans']
-    rejection_fields = [
-        'EmptyRejection', 'FilledRejection', 'BreakdownRejection',
-        'ManpowerDentRejection', 'HighPressureRejection', 'WaterCanRejection',
-        'MachineDentCans', 'FadeCans', 'UnprintedCans', 'ScratchedCans',
-        'LidRejection', 'QASample', 'QAOtherSample'
+# Records laid out per batch; bounds how many flowables exist at once
+CHUNK_SIZE = 200
+
+# Worker processes used for large reports (RTD_PDF_WORKERS, 1 = serial)
+PDF_WORKERS = int(os.environ.get("RTD_PDF_WORKERS", "1"))
+
+# Smaller reports are not worth the process start-up cost
+PARALLEL_MIN_RECORDS = 200
+
+# Reports up to this size stay in memory before spilling to a temp file
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
+
+# "detailed" lays out every report; "summary" prints aggregated tables only
+REPORT_MODES = ["detailed", "summary"]
+
+# Period rows in the summary before days are grouped into weeks or months
+SUMMARY_MAX_PERIODS = 62
+
+styles = getSampleStyleSheet()
+
+# Custom styles
+title_style = ParagraphStyle(
+    'CustomTitle',
+    parent=styles['Heading1'],
+    fontSize=20,
+    spaceAfter=20,
+    alignment=1  # Center alignment
+)
+
+header_style = ParagraphStyle(
+    'CustomHeader',
+    parent=styles['Heading2'],
+    fontSize=14,
+    spaceBefore=10,
+    spaceAfter=10,
+    textColor=colors.HexColor('#1a472a')
+)
+
+# Shared by every table in the report
+table_style = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f0f0f0')),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('BOX', (0, 0), (-1, -1), 1, colors.black)
+])
+
+# Summary tables: shaded header row, right-aligned numbers, totals row in bold
+summary_table_style = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a472a')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+    ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+    ('BACKGROUND', (0, -1), (-1, -1), colors.HexColor('#f0f0f0')),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('ALIGN', (1, 0), (-1, -1), 'RIGHT'),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+    ('TOPPADDING', (0, 0), (-1, -1), 4),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ('BOX', (0, 0), (-1, -1), 1, colors.black)
+])
+
+SUMMARY_HEADER = ["Reports", "Total Case", "Total Cans", "Rejections", "Rejection %", "Yield %"]
+
+def format_date(value):
+    """Format a report date for display, leaving missing dates blank"""
+    return "" if pd.isna(value) else f"{value:%Y-%m-%d}"
+
+def _record_elements(row, total_cans):
+    """Flowables for a single report record"""
+    elements = []
+
+    # Record header with better styling
+    elements.append(Paragraph(
+        f"Report: {format_date(row['Date'])} - {row['VariantName']} ({row['BatchCode']})",
+        header_style
+    ))
+
+    # Basic Information
+    elements.append(Paragraph("Basic Information", styles["Heading3"]))
+    basic_info = [
+        ["Date", f"{format_date(row['Date'])}"],
+        ["Variant Name", row["VariantName"]],
+        ["Batch Code", row["BatchCode"]],
+        ["Total Cans", str(total_cans)],
+        ["Total Case", str(row["TotalCase"])],
+        ["Loose Cans", str(row["LooseCans"])],
+        ["WIP Cans", str(row["WIPCans"])]
+    ]
+
+    basic_table = Table(basic_info, colWidths=[2.5*inch, 5*inch])
+    basic_table.setStyle(table_style)
+    elements.append(basic_table)
+    elements.append(Spacer(1, 15))
+
+    # Rejection Information with better layout
+    elements.append(Paragraph("Rejection Details", styles["Heading3"]))
+    rejection_info = [
+        ["Empty Rejection", str(row["EmptyRejection"])],
+        ["Filled Rejection", str(row["FilledRejection"])],
+        ["Breakdown Rejection", str(row["BreakdownRejection"])],
+        ["Manpower Dent Rejection", str(row["ManpowerDentRejection"])],
+        ["High Pressure Rejection", str(row["HighPressureRejection"])],
+        ["Water Can Rejection", str(row["WaterCanRejection"])],
+        ["Machine Dent Cans", str(row["MachineDentCans"])],
+        ["Fade Cans", str(row["FadeCans"])],
+        ["Unprinted Cans", str(row["UnprintedCans"])],
+        ["Scratched Cans", str(row["ScratchedCans"])],
+        ["Lid Rejection", str(row["LidRejection"])],
+        ["Reject Shipper", str(row["RejectShipper"])]
+    ]
+
+    rejection_table = Table(rejection_info, colWidths=[3*inch, 4.5*inch])
+    rejection_table.setStyle(table_style)
+    elements.append(rejection_table)
+    elements.append(Spacer(1, 15))
+
+    # QA Information
+    elements.append(Paragraph("Quality Assurance", styles["Heading3"]))
+    qa_info = [
+        ["QA Sample", str(row["QASample"])],
+        ["QA Other Sample", str(row["QAOtherSample"])],
+        ["Empty Sample", str(row["EmptySample"])]
     ]
-    rejection_total = sum(row[field] for field in rejection_fields)
-    return base_cans + rejection_total
 
-def create_pdf_report(df, start_date, end_date):
-    """Generate a PDF report from the dataframe"""
-    buffer = io.BytesIO()
+    qa_table = Table(qa_info, colWidths=[2.5*inch, 5*inch])
+    qa_table.setStyle(table_style)
+    elements.append(qa_table)
+    return elements
+
+def _report_chunks(df, start_date, end_date, chunk_size, include_title=True):
+    """Yield the report's flowables a chunk of records at a time"""
+    # Title
+    if include_title:
+        yield [
+            Paragraph("Production Report", title_style),
+            Paragraph(f"Period: {start_date} to {end_date}", styles["Normal"]),
+            Spacer(1, 20)
+        ]
+
+    # Process each record
+    for start in range(0, len(df), chunk_size):
+        chunk = df.iloc[start:start + chunk_size]
+        totals = compute_total_cans(chunk).to_numpy()
+        elements = []
+        for position, ((_, row), total_cans) in enumerate(zip(chunk.iterrows(), totals), start):
+            elements.extend(_record_elements(row, total_cans))
+
+            # Add page break after each report except the last one
+            if position < len(df) - 1:
+                elements.append(PageBreak())
+        yield elements
+
+class _FlowableStream(list):
+    """Flowable list that refills itself from a generator as the build consumes it
+
+    ReportLab's build loop only looks at the front of the list and deletes
+    flowables as they are laid out, so topping it up on each delete keeps
+    roughly one chunk of records alive at a time.
+    """
+
+    def __init__(self, chunks, low_water):
+        super().__init__()
+        self._chunks = chunks
+        self._low_water = low_water
+        self._refill()
+
+    def _refill(self):
+        while len(self) < self._low_water:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self.extend(chunk)
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._refill()
+
+@profiled()
+def write_pdf_report(df, start_date, end_date, target, chunk_size=CHUNK_SIZE, include_title=True):
+    """Render the PDF report into a file path or binary file object, chunk by chunk"""
     doc = SimpleDocTemplate(
-        buffer,
+        target,
         pagesize=letter,
         rightMargin=36,
         leftMargin=36,
         topMargin=36,
         bottomMargin=36
     )
+    chunks = _report_chunks(df, start_date, end_date, chunk_size, include_title)
+    doc.build(_FlowableStream(chunks, low_water=chunk_size))
 
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=20,
-        spaceAfter=20,
-        alignment=1  # Center alignment
-    )
-    
-    header_style = ParagraphStyle(
-        'CustomHeader',
-        parent=styles['Heading2'],
-        fontSize=14,
-        spaceBefore=10,
-        spaceAfter=10,
-        textColor=colors.HexColor('#1a472a')
-    )
+def _render_part(args):
+    """Render one slice of records to PDF bytes in a worker process"""
+    df, start_date, end_date, include_title = args
+    output = io.BytesIO()
+    write_pdf_report(df, start_date, end_date, output, include_title=include_title)
+    return output.getvalue()
 
-    # Title
-    elements.append(Paragraph("Production Report", title_style))
-    elements.append(Paragraph(f"Period: {start_date} to {end_date}", styles["Normal"]))
-    elements.append(Spacer(1, 20))
+@profiled()
+def write_pdf_report_parallel(df, start_date, end_date, target, workers=PDF_WORKERS):
+    """Render slices of the report in a process pool and merge them in record order
 
-    # Process each record
-    for idx, row in df.iterrows():
-        total_cans = calculate_total_cans(row)
-
-        # Record header with better styling
-        elements.append(Paragraph(
-            f"Report: {row['Date']} - {row['VariantName']} ({row['BatchCode']})",
-            header_style
-        ))
-
-        # Basic Information
-        elements.append(Paragraph("Basic Information", styles["Heading3"]))
-        basic_info = [
-            ["Date", str(row["Date"])],
-            ["Variant Name", row["VariantName"]],
-            ["Batch Code", row["BatchCode"]],
-            ["Total Cans", str(total_cans)],
-            ["Total Case", str(row["TotalCase"])],
-            ["Loose Cans", str(row["LooseCans"])],
-            ["WIP Cans", str(row["WIPCans"])]
-        ]
-        
-        basic_table = Table(basic_info, colWidths=[2.5*inch, 5*inch])
-        basic_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f0f0f0')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('BOX', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        elements.append(basic_table)
-        elements.append(Spacer(1, 15))
-
-        # Rejection Information with better layout
-        elements.append(Paragraph("Rejection Details", styles["Heading3"]))
-        rejection_info = [
-            ["Empty Rejection", str(row["EmptyRejection"])],
-            ["Filled Rejection", str(row["FilledRejection"])],
-            ["Breakdown Rejection", str(row["BreakdownRejection"])],
-            ["Manpower Dent Rejection", str(row["ManpowerDentRejection"])],
-            ["High Pressure Rejection", str(row["HighPressureRejection"])],
-            ["Water Can Rejection", str(row["WaterCanRejection"])],
-            ["Machine Dent Cans", str(row["MachineDentCans"])],
-            ["Fade Cans", str(row["FadeCans"])],
-            ["Unprinted Cans", str(row["UnprintedCans"])],
-            ["Scratched Cans", str(row["ScratchedCans"])],
-            ["Lid Rejection", str(row["LidRejection"])],
-            ["Reject Shipper", str(row["RejectShipper"])]
+    Every record starts on a new page, so slices rendered separately and
+    concatenated give the same pages as the serial layout. Reports under
+    PARALLEL_MIN_RECORDS records, or without pypdf (the parallel-pdf extra),
+    are rendered by the serial path.
+    """
+    if len(df) < PARALLEL_MIN_RECORDS:
+        return write_pdf_report(df, start_date, end_date, target)
+    try:
+        from pypdf import PdfReader, PdfWriter
+    except ImportError:
+        return write_pdf_report(df, start_date, end_date, target)
+
+    # A few slices per worker keeps the pool busy when records vary in length
+    slice_size = max(1, -(-len(df) // (workers * 4)))
+    parts = [
+        (df.iloc[start:start + slice_size], start_date, end_date, start == 0)
+        for start in range(0, len(df), slice_size)
+    ]
+    writer = PdfWriter()
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        for content in pool.map(_render_part, parts):
+            writer.append(PdfReader(io.BytesIO(content)))
+    writer.write(target)
+
+def _summary_rows(grouped, format_label=str):
+    """Table rows of reports, counts and metrics per group of a rollup plus a totals row"""
+    sums = grouped[COUNT_COLUMNS].sum()
+    reports = grouped["Reports"].sum()
+    totals = sums.sum().to_frame().T
+    rows = []
+    for label, count, (_, row) in zip(
+        [format_label(value) for value in sums.index] + ["Total"],
+        list(reports) + [reports.sum()],
+        pd.concat([add_metrics(sums), add_metrics(totals)]).iterrows()
+    ):
+        rows.append([
+            label,
+            f"{int(count):,}",
+            f"{int(row['TotalCase']):,}",
+            f"{int(row['TotalCans']):,}",
+            f"{int(row['TotalRejections']):,}",
+            f"{row['RejectionRate']:.2f}%",
+            f"{row['Yield']:.2f}%",
+        ])
+    return rows
+
+def _summary_table(first_column, rows):
+    table = Table([[first_column] + SUMMARY_HEADER] + rows, repeatRows=1)
+    table.setStyle(summary_table_style)
+    return table
+
+@profiled()
+def write_summary_pdf_report(df, start_date, end_date, target):
+    """Render totals per variant and per period instead of one page per report
+
+    Everything is aggregated through the daily rollup first, so the layout
+    work depends on the number of variants and days, not on the row count.
+    Long ranges are summarised per week or month to stay a few pages long.
+    """
+    rollup = build_rollup(df)
+    elements = [
+        Paragraph("Production Summary Report", title_style),
+        Paragraph(f"Period: {start_date} to {end_date}", styles["Normal"]),
+        Spacer(1, 20)
+    ]
+    if rollup.empty:
+        elements.append(Paragraph("No reports in this period.", styles["Normal"]))
+    else:
+        elements += [
+            Paragraph("By Variant", header_style),
+            _summary_table("Variant", _summary_rows(rollup.groupby("VariantName", observed=True))),
+            Spacer(1, 15),
         ]
-        
-        rejection_table = Table(rejection_info, colWidths=[3*inch, 4.5*inch])
-        rejection_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f0f0f0')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('BOX', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        elements.append(rejection_table)
-        elements.append(Spacer(1, 15))
-
-        # QA Information
-        elements.append(Paragraph("Quality Assurance", styles["Heading3"]))
-        qa_info = [
-            ["QA Sample", str(row["QASample"])],
-            ["QA Other Sample", str(row["QAOtherSample"])],
-            ["Empty Sample", str(row["EmptySample"])]
+
+        rejections = rollup[REJECTION_COLUMNS].sum().sort_values(ascending=False)
+        total_rejections = rejections.sum()
+        rejection_rows = [
+            [column, f"{int(count):,}", f"{count * 100 / total_rejections:.2f}%" if total_rejections else "0.00%"]
+            for column, count in rejections.items()
+        ] + [["Total", f"{int(total_rejections):,}", "100.00%" if total_rejections else "0.00%"]]
+        rejection_table = Table([["Rejection Type", "Count", "Share"]] + rejection_rows, repeatRows=1)
+        rejection_table.setStyle(summary_table_style)
+        elements += [Paragraph("Rejections by Type", header_style), rejection_table, Spacer(1, 15)]
+
+        granularity = choose_granularity(rollup, "day", SUMMARY_MAX_PERIODS)
+        periods, _, _ = bucket_rollup(rollup, granularity)
+        heading = {"day": "By Day", "week": "By Week (starting)", "month": "By Month"}[granularity]
+        date_format = "%Y-%m" if granularity == "month" else "%Y-%m-%d"
+        elements += [
+            Paragraph(heading, header_style),
+            _summary_table("Date", _summary_rows(
+                periods.groupby("Date"), lambda value: f"{value:{date_format}}"
+            )),
         ]
-        
-        qa_table = Table(qa_info, colWidths=[2.5*inch, 5*inch])
-        qa_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f0f0f0')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ('BOX', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        elements.append(qa_table)
-        
-        # Add page break after each report except the last one
-        if idx < len(df) - 1:
-            elements.append(PageBreak())
 
+    doc = SimpleDocTemplate(
+        target,
+        pagesize=letter,
+        rightMargin=36,
+        leftMargin=36,
+        topMargin=36,
+        bottomMargin=36
+    )
     doc.build(elements)
-    buffer.seek(0)
-    return buffer.getvalue()
+
+@profiled()
+def create_pdf_report(df, start_date, end_date, chunk_size=CHUNK_SIZE, workers=None, mode="detailed"):
+    """Generate a PDF report from the dataframe, one page per report or a summary"""
+    if mode not in REPORT_MODES:
+        raise ValueError(f"Unknown PDF report mode: {mode}")
+    workers = PDF_WORKERS if workers is None else workers
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as output:
+        if mode == "summary":
+            write_summary_pdf_report(df, start_date, end_date, output)
+        elif workers > 1 and len(df) >= PARALLEL_MIN_RECORDS:
+            write_pdf_report_parallel(df, start_date, end_date, output, workers)
+        else:
+            write_pdf_report(df, start_date, end_date, output, chunk_size)
+        output.seek(0)
+        return output.read()
@@ -0,0 +1,181 @@
+import os
+import json
+import time
+import logging
+import threading
+import functools
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+import pandas as pd
+
+# Opt in with RTD_PROFILE=1 (timings and row counts) or RTD_PROFILE=memory
+# (also traces allocations, which slows every Python allocation down)
+PROFILE_MODE = os.environ.get("RTD_PROFILE", "").lower()
+
+# Most recent calls kept for the diagnostics page
+PROFILE_MAX_RECORDS = 1000
+
+logger = logging.getLogger("rtd.profile")
+
+_enabled = PROFILE_MODE not in ("", "0", "false", "off")
+_trace_memory = PROFILE_MODE == "memory"
+_records = deque(maxlen=PROFILE_MAX_RECORDS)
+_records_lock = threading.Lock()
+_local = threading.local()
+
+def enable(memory=False):
+    """Start recording calls, optionally with allocated memory"""
+    global _enabled, _trace_memory
+    _enabled = True
+    _trace_memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not memory and tracemalloc.is_tracing():
+        # Tracing slows every allocation, so do not leave it running unseen
+        tracemalloc.stop()
+
+def disable():
+    """Stop recording calls and stop tracing memory"""
+    global _enabled, _trace_memory
+    _enabled = False
+    if _trace_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _trace_memory = False
+
+def is_enabled():
+    return _enabled
+
+def is_tracing_memory():
+    return _trace_memory and tracemalloc.is_tracing()
+
+def _rows(value):
+    return len(value) if isinstance(value, pd.DataFrame) else None
+
+class _Call:
+    """Measurements for one profiled block, filled in by profile_block"""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows_in = None
+        self.rows_out = None
+        self.start_memory = None
+        self.peak_memory = 0
+
+@contextmanager
+def profile_block(name, rows_in=None):
+    """Record duration, rows and allocated memory of the enclosed block
+
+    The yielded call object lets the block set rows_out once it has a result.
+    Memory is tracemalloc's process-wide peak, so calls running at the same
+    time in other threads are counted too.
+    """
+    if not _enabled:
+        yield _Call(name)
+        return
+
+    call = _Call(name)
+    call.rows_in = rows_in
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    tracing = is_tracing_memory()
+    if tracing:
+        current, peak = tracemalloc.get_traced_memory()
+        # Nested calls reset the peak, so hand the enclosing call what it has seen so far
+        if stack:
+            stack[-1].peak_memory = max(stack[-1].peak_memory, peak)
+        tracemalloc.reset_peak()
+        call.start_memory = current
+    stack.append(call)
+    started_at = datetime.now()
+    start = time.perf_counter()
+    error = None
+    try:
+        yield call
+    except BaseException as e:
+        error = type(e).__name__
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        stack.pop()
+        record = {
+            "name": name,
+            "started_at": started_at.isoformat(timespec="milliseconds"),
+            "seconds": round(seconds, 6),
+            "rows_in": call.rows_in,
+            "rows_out": call.rows_out,
+            "peak_alloc_mb": None,
+            "net_alloc_mb": None,
+            "thread": threading.current_thread().name,
+            "error": error,
+        }
+        if tracing and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            call.peak_memory = max(call.peak_memory, peak)
+            if stack:
+                stack[-1].peak_memory = max(stack[-1].peak_memory, call.peak_memory)
+            record["peak_alloc_mb"] = round((call.peak_memory - call.start_memory) / 2**20, 3)
+            record["net_alloc_mb"] = round((current - call.start_memory) / 2**20, 3)
+        with _records_lock:
+            _records.append(record)
+        logger.info(json.dumps(record))
+
+def profiled(name=None):
+    """Decorator recording each call of a function when profiling is enabled
+
+    Row counts come from the first dataframe argument and a dataframe result.
+    """
+    def decorate(fn):
+        label = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            frames = [value for value in (*args, *kwargs.values()) if isinstance(value, pd.DataFrame)]
+            with profile_block(label, rows_in=len(frames[0]) if frames else None) as call:
+                result = fn(*args, **kwargs)
+                call.rows_out = _rows(result)
+            return result
+        return wrapper
+    return decorate
+
+def get_records():
+    """Recorded calls, oldest first"""
+    with _records_lock:
+        return list(_records)
+
+def clear_records():
+    with _records_lock:
+        _records.clear()
+
+def summary():
+    """Per entry point call count, total/mean/max seconds and largest rows and memory"""
+    records = pd.DataFrame(get_records())
+    if records.empty:
+        return records
+    return records.groupby("name").agg(
+        calls=("seconds", "size"),
+        total_seconds=("seconds", "sum"),
+        mean_seconds=("seconds", "mean"),
+        max_seconds=("seconds", "max"),
+        max_rows_in=("rows_in", "max"),
+        max_rows_out=("rows_out", "max"),
+        max_peak_alloc_mb=("peak_alloc_mb", "max"),
+    ).sort_values("total_seconds", ascending=False)
+
+def dump_json(path=None):
+    """Recorded calls as a JSON document, also written to path when given"""
+    document = json.dumps({
+        "memory_traced": is_tracing_memory(),
+        "records": get_records(),
+    }, indent=2)
+    if path:
+        with open(path, "w") as f:
+            f.write(document)
+    return document
+
+if _trace_memory:
+    tracemalloc.start()
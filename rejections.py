@@ -0,0 +1,90 @@
+import pandas as pd
+from schema import REJECTION_COLUMNS
+from metrics import total_cans, total_rejections, rejections_per_thousand
+
+# Rolling windows, in days, for the rejection rate trends
+TREND_WINDOWS = [7, 30]
+
+# Keys of the single grouped pass; every other view is derived from its result
+ANALYSIS_KEYS = ["VariantName", "BatchCode", "Date"]
+
+def _with_rates(totals):
+    """Add TotalRejections and RatePer1000 (rejections per 1,000 cans) to summed totals"""
+    rejections = total_rejections(totals)
+    return totals.assign(
+        TotalRejections=rejections,
+        RatePer1000=rejections_per_thousand(rejections, totals["TotalCans"])
+    )
+
+class RejectionAnalytics:
+    """Rejection Pareto, rates and trends from one grouped pass over the reports
+
+    The reports are summed once per variant x batch x date into a frame that
+    only holds the rejection columns and TotalCans; the per-variant,
+    per-batch and daily views below are all aggregations of that result.
+    """
+
+    def __init__(self, df):
+        frame = df[ANALYSIS_KEYS + REJECTION_COLUMNS].copy()
+        frame["TotalCans"] = total_cans(df).to_numpy()
+        frame[REJECTION_COLUMNS] = frame[REJECTION_COLUMNS].astype("int64")
+        self.grouped = frame.groupby(ANALYSIS_KEYS, observed=True, sort=False, dropna=False).sum()
+
+        # Per variant and per batch totals with their rate per 1,000 cans
+        self.by_variant = _with_rates(
+            self.grouped.groupby(level="VariantName", observed=True, dropna=False).sum()
+        )
+        self.by_batch = _with_rates(
+            self.grouped.groupby(level=["VariantName", "BatchCode"], observed=True, dropna=False).sum()
+        ).reset_index(level="VariantName")
+
+        # Daily totals per variant, the base for the rolling trends
+        self.variant_daily = self.grouped.groupby(level=["VariantName", "Date"], observed=True, dropna=False).sum()
+
+    def pareto(self, variant=None, batch=None):
+        """Rejection types ranked by count with their share and cumulative share (%)
+
+        Covers every report, one variant or one batch code.
+        """
+        if batch is not None:
+            totals = self.by_batch.loc[[batch], REJECTION_COLUMNS].sum() if batch in self.by_batch.index else None
+        elif variant is not None:
+            totals = self.by_variant.loc[variant, REJECTION_COLUMNS] if variant in self.by_variant.index else None
+        else:
+            totals = self.by_variant[REJECTION_COLUMNS].sum()
+        if totals is None:
+            totals = pd.Series(0, index=REJECTION_COLUMNS)
+
+        ranked = totals.astype("int64").sort_values(ascending=False, kind="stable")
+        total = ranked.sum()
+        share = ranked * 100 / total if total else ranked * 0.0
+        return pd.DataFrame({
+            "RejectionType": ranked.index,
+            "Count": ranked.to_numpy(),
+            "Share": share.to_numpy(),
+            "CumulativeShare": share.cumsum().to_numpy(),
+        })
+
+    def trends(self, variant=None):
+        """Daily rejections per 1,000 cans with rolling TREND_WINDOWS day rates
+
+        Rolling rates divide the summed rejections by the summed cans over the
+        window, so busy days weigh more than quiet ones.
+        """
+        daily = self.variant_daily
+        if variant is not None:
+            daily = daily.xs(variant, level="VariantName") if variant in daily.index.get_level_values(0) else daily.iloc[:0]
+        daily = daily.groupby(level="Date").sum().sort_index()
+        daily = daily[daily.index.notna()]
+        rejections = total_rejections(daily)
+        cans = daily["TotalCans"]
+        trends = pd.DataFrame({
+            "TotalRejections": rejections,
+            "TotalCans": cans,
+            "RatePer1000": rejections_per_thousand(rejections, cans),
+        })
+        for window in TREND_WINDOWS:
+            window_rejections = rejections.rolling(f"{window}D").sum()
+            window_cans = cans.rolling(f"{window}D").sum()
+            trends[f"Rolling{window}d"] = rejections_per_thousand(window_rejections, window_cans)
+        return trends.rename_axis("Date").reset_index()
@@ -0,0 +1,170 @@
+import io
+import os
+import json
+import pandas as pd
+from schema import COUNT_COLUMNS
+from storage import write_atomic, write_text_atomic
+
+# One row per Date x VariantName holding the sum of every count column
+ROLLUP_KEYS = ["Date", "VariantName"]
+ROLLUP_COLUMNS = ROLLUP_KEYS + ["Reports"] + COUNT_COLUMNS
+
+# Chart time buckets, finest first, and the pandas period each one groups dates by
+GRANULARITIES = {"day": "D", "week": "W", "month": "M"}
+
+# Upper bound on date x variant bars sent to the browser per chart
+MAX_CHART_POINTS = 1500
+
+# Label for the smallest variants once they are merged to respect MAX_CHART_POINTS
+OTHER_VARIANTS = "Other"
+
+# Top variants a chart keeps separate; a requested granularity is coarsened to make room for them
+MIN_CHART_VARIANTS = 4
+
+def empty_rollup():
+    """Return an empty rollup frame"""
+    return pd.DataFrame({
+        "Date": pd.Series(dtype="datetime64[ns]"),
+        "VariantName": pd.Series(dtype="category"),
+        **{col: pd.Series(dtype="int64") for col in ["Reports"] + COUNT_COLUMNS},
+    })
+
+def build_rollup(df):
+    """Aggregate report rows into per date x variant sums"""
+    if df.empty:
+        return empty_rollup()
+    grouped = df.groupby(ROLLUP_KEYS, observed=True, dropna=False)
+    rollup = grouped[COUNT_COLUMNS].sum().astype("int64")
+    rollup.insert(0, "Reports", grouped.size().astype("int64"))
+    return rollup.reset_index()[ROLLUP_COLUMNS]
+
+def combine_rollups(base, delta, sign=1):
+    """Add (sign=1) or subtract (sign=-1) a delta rollup from a base rollup"""
+    delta = delta.copy()
+    value_columns = ["Reports"] + COUNT_COLUMNS
+    delta[value_columns] = delta[value_columns] * sign
+    combined = pd.concat([base, delta], ignore_index=True)
+    combined["VariantName"] = combined["VariantName"].astype("category")
+    combined = combined.groupby(ROLLUP_KEYS, observed=True, dropna=False)[value_columns].sum().reset_index()
+    return combined[combined["Reports"] > 0][ROLLUP_COLUMNS].reset_index(drop=True)
+
+def _periods(dates, granularity):
+    return dates.dt.to_period(GRANULARITIES[granularity]).dt.start_time
+
+def choose_granularity(rollup, granularity=None, max_points=MAX_CHART_POINTS):
+    """Granularity to chart a rollup at: the requested one, coarsened until the dates fit
+
+    With no request this is the finest bucket whose date x variant points fit
+    in max_points; a requested granularity is only coarsened when its dates
+    times MIN_CHART_VARIANTS (or fewer, if there are fewer variants) would
+    exceed max_points.
+    """
+    names = list(GRANULARITIES)
+    dates = rollup["Date"].dropna()
+    variants = max(1, rollup["VariantName"].nunique())
+    if granularity is not None:
+        variants = min(variants, MIN_CHART_VARIANTS)
+    for name in names[names.index(granularity or names[0]):]:
+        if _periods(dates, name).nunique() * variants <= max_points:
+            return name
+    return names[-1]
+
+def bucket_rollup(rollup, granularity=None, max_points=MAX_CHART_POINTS):
+    """Aggregate a rollup into day, week or month buckets for charting
+
+    Returns the bucketed rollup (Date is the first day of each bucket), the
+    granularity used and how many variants were merged. When the variants
+    would still exceed max_points, the lowest-producing ones are merged into
+    OTHER_VARIANTS; the largest variant is always kept.
+    """
+    granularity = choose_granularity(rollup, granularity, max_points)
+    value_columns = ["Reports"] + COUNT_COLUMNS
+    bucketed = rollup.assign(Date=_periods(rollup["Date"], granularity))
+    bucketed = bucketed.groupby(ROLLUP_KEYS, observed=True)[value_columns].sum().reset_index()
+
+    merged = 0
+    max_variants = max(2, max_points // max(1, bucketed["Date"].nunique()))
+    variant_count = bucketed["VariantName"].nunique()
+    if variant_count > max_variants:
+        volume = bucketed.groupby("VariantName", observed=True)["TotalCase"].sum()
+        keep = volume.nlargest(max_variants - 1).index
+        merged = variant_count - len(keep)
+        names = bucketed["VariantName"].astype(str).where(bucketed["VariantName"].isin(keep), OTHER_VARIANTS)
+        bucketed = bucketed.assign(VariantName=names.astype("category"))
+        bucketed = bucketed.groupby(ROLLUP_KEYS, observed=True)[value_columns].sum().reset_index()
+    return bucketed[ROLLUP_COLUMNS], granularity, merged
+
+def _read_meta(path):
+    try:
+        with open(path + ".meta") as f:
+            meta = json.load(f)
+        return {"version": meta["version"], "deltas_size": meta.get("deltas_size", 0)}
+    except (FileNotFoundError, ValueError, KeyError):
+        return None
+
+def _write_meta(path, version, deltas_size):
+    write_text_atomic(path + ".meta", json.dumps({"version": version, "deltas_size": deltas_size}))
+
+def rollup_version(path):
+    """Data version the stored rollup reflects, read from its small meta file"""
+    meta = _read_meta(path)
+    return meta and meta["version"]
+
+def _read_rollup_csv(source):
+    rollup = pd.read_csv(source, parse_dates=["Date"], dtype={"VariantName": str})
+    rollup["VariantName"] = rollup["VariantName"].astype("category")
+    return rollup[ROLLUP_COLUMNS]
+
+def read_rollup(path):
+    """Read a stored rollup with its pending deltas folded in
+
+    Returns the rollup, the data version it reflects and the size in bytes
+    of the deltas appended since the base file was last written. Only the
+    deltas recorded in the meta file are read, so a partly written append
+    left by a crash is ignored.
+    """
+    meta = _read_meta(path)
+    if meta is None:
+        return None, None, 0
+    try:
+        rollup = _read_rollup_csv(path)
+        if meta["deltas_size"]:
+            with open(path + ".deltas", "rb") as f:
+                deltas = _read_rollup_csv(io.BytesIO(f.read(meta["deltas_size"])))
+            rollup = combine_rollups(rollup, deltas)
+    except (FileNotFoundError, ValueError, KeyError):
+        return None, None, 0
+    return rollup, meta["version"], meta["deltas_size"]
+
+def write_rollup(rollup, path, version):
+    """Store a whole rollup, folding away any appended deltas, with the data version it reflects"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    # Until the new meta is written the files disagree, so mark the rollup stale first
+    _write_meta(path, None, 0)
+    write_atomic(rollup, path, date_format="%Y-%m-%d")
+    write_text_atomic(path + ".deltas", "")
+    _write_meta(path, version, 0)
+
+def append_rollup(delta, path, version, sign=1):
+    """Append a delta rollup (sign=-1 subtracts it) instead of rewriting the stored rollup
+
+    The caller must hold the rollup lock and have checked that the stored
+    rollup is current; the meta file is stamped with version afterwards.
+    """
+    if delta.empty:
+        return
+    meta = _read_meta(path)
+    delta = delta.copy()
+    value_columns = ["Reports"] + COUNT_COLUMNS
+    delta[value_columns] = delta[value_columns] * sign
+    deltas_path = path + ".deltas"
+    with open(deltas_path, "a") as f:
+        # Drop anything past the recorded size, left over from an interrupted append
+        f.truncate(meta["deltas_size"])
+        delta.to_csv(f, header=meta["deltas_size"] == 0, index=False, date_format="%Y-%m-%d")
+    _write_meta(path, version, os.path.getsize(deltas_path))
+
+def stamp_rollup(path, version):
+    """Record that the stored rollup also matches version, e.g. after storage was compacted"""
+    meta = _read_meta(path)
+    _write_meta(path, version, meta["deltas_size"] if meta else 0)
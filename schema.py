@@ -0,0 +1,132 @@
+import uuid
+import pandas as pd
+
+# Columns of a report as entered on the form or in an imported shift sheet
+ENTRY_COLUMNS = [
+    "Date", "VariantName", "BatchCode", "TotalCase",
+    "LooseCans", "EmptyRejection", "EmptySample", "WIPCans",
+    "FilledRejection", "BreakdownRejection", "ManpowerDentRejection",
+    "HighPressureRejection", "WaterCanRejection", "MachineDentCans",
+    "FadeCans", "UnprintedCans", "ScratchedCans", "LidRejection",
+    "QASample", "QAOtherSample", "RejectShipper"
+]
+
+# Stable identifier given to each report when it is first saved
+ID_COLUMN = "ReportID"
+
+# Column order of the reports table as stored on disk
+COLUMNS = ENTRY_COLUMNS + [ID_COLUMN]
+
+CATEGORY_COLUMNS = ["VariantName", "BatchCode"]
+COUNT_COLUMNS = [col for col in ENTRY_COLUMNS if col not in ["Date"] + CATEGORY_COLUMNS]
+
+REJECTION_COLUMNS = [
+    "EmptyRejection", "FilledRejection", "BreakdownRejection",
+    "ManpowerDentRejection", "HighPressureRejection", "WaterCanRejection",
+    "MachineDentCans", "FadeCans", "UnprintedCans", "ScratchedCans",
+    "LidRejection"
+]
+
+# Every can that left the line: good cases and loose cans plus rejections and QA samples
+GOOD_CAN_COLUMNS = ["TotalCase", "LooseCans"]
+TOTAL_CAN_COLUMNS = GOOD_CAN_COLUMNS + REJECTION_COLUMNS + ["QASample", "QAOtherSample"]
+
+# Counts are whole, non-negative numbers; nullable so blank cells survive parsing
+COUNT_DTYPE = "UInt32"
+
+# Largest count COUNT_DTYPE can hold; larger values are rejected on entry
+MAX_COUNT = 2**32 - 1
+
+DTYPES = {
+    "Date": "datetime64[ns]",
+    **{col: "category" for col in CATEGORY_COLUMNS},
+    **{col: COUNT_DTYPE for col in COUNT_COLUMNS},
+    ID_COLUMN: "string",
+}
+
+# Read stored IDs, variants and batch codes as text so "0507" stays "0507"
+TEXT_DTYPES = {ID_COLUMN: str, **{col: str for col in CATEGORY_COLUMNS}}
+
+# Form labels and help text for each field
+LABELS = {
+    "Date": "📅 Report Date",
+    "VariantName": "🏷️ Variant Name",
+    "BatchCode": "📦 Batch Code",
+    "TotalCase": "📦 Total Case",
+    "LooseCans": "🥫 Loose Cans",
+    "WIPCans": "⚙️ WIP Cans",
+    "QASample": "🔍 QA Sample",
+    "QAOtherSample": "🔍 QA Other Sample",
+    "EmptySample": "🔍 Empty Sample",
+    "EmptyRejection": "Empty Rejection",
+    "FilledRejection": "Filled Rejection",
+    "BreakdownRejection": "Breakdown Rejection",
+    "ManpowerDentRejection": "Manpower Dent",
+    "HighPressureRejection": "High Pressure",
+    "WaterCanRejection": "Water Can",
+    "MachineDentCans": "Machine Dent",
+    "FadeCans": "Fade Cans",
+    "LidRejection": "Lid Rejection",
+    "UnprintedCans": "Unprinted Cans",
+    "ScratchedCans": "Scratched Cans",
+    "RejectShipper": "Reject Shipper",
+}
+
+HELP = {
+    "TotalCase": "Enter the total number of cases",
+    "LooseCans": "Enter number of loose cans",
+    "WIPCans": "Work in progress cans",
+}
+
+# Daily Entry form layout: (section heading, fields per column)
+FORM_SECTIONS = [
+    ("Production Quantities", [["TotalCase"], ["LooseCans"], ["WIPCans"]]),
+    ("QA Samples", [["QASample"], ["QAOtherSample"], ["EmptySample"]]),
+    ("Rejections", [
+        ["EmptyRejection", "FilledRejection", "BreakdownRejection"],
+        ["ManpowerDentRejection", "HighPressureRejection", "WaterCanRejection"],
+        ["MachineDentCans", "FadeCans", "LidRejection"],
+    ]),
+    (None, [["UnprintedCans", "ScratchedCans"], ["RejectShipper"]]),
+]
+
+def new_report_ids(count):
+    """count fresh random report IDs"""
+    return [uuid.uuid4().hex[:16] for _ in range(count)]
+
+def assign_report_ids(df):
+    """Return df with a new ReportID on every row that lacks one"""
+    if ID_COLUMN in df.columns:
+        ids = df[ID_COLUMN].astype(object)
+    else:
+        ids = pd.Series(None, index=df.index, dtype=object)
+    missing = ids.isna() | (ids == "")
+    if not missing.any():
+        return df
+    ids = ids.copy()
+    ids[missing] = new_report_ids(int(missing.sum()))
+    return df.assign(**{ID_COLUMN: ids})
+
+def empty_frame():
+    """Return an empty reports frame with the schema dtypes"""
+    return pd.DataFrame({col: pd.Series(dtype=DTYPES[col]) for col in COLUMNS})
+
+def apply_schema(df, columns=None):
+    """Convert raw stored columns to the schema dtypes, optionally for a subset of columns"""
+    columns = list(columns or COLUMNS)
+    df = df.reindex(columns=columns)
+    if "Date" in columns:
+        df["Date"] = pd.to_datetime(df["Date"], errors="coerce").astype(DTYPES["Date"])
+    for col in CATEGORY_COLUMNS:
+        if col in columns:
+            df[col] = df[col].astype("category")
+    if ID_COLUMN in columns:
+        df[ID_COLUMN] = df[ID_COLUMN].astype(DTYPES[ID_COLUMN])
+    for col in COUNT_COLUMNS:
+        if col not in columns:
+            continue
+        values = pd.to_numeric(df[col], errors="coerce")
+        # Anything that is not a whole count COUNT_DTYPE can hold is treated as missing
+        values = values.where((values >= 0) & (values <= MAX_COUNT) & (values % 1 == 0))
+        df[col] = values.fillna(0).astype(COUNT_DTYPE)
+    return df
@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+# Sorts after any character a batch code or variant name can contain
+_PREFIX_END = "\U0010ffff"
+
+def parse_patterns(value):
+    """Normalise a text filter to a tuple of patterns, or None when it matches everything
+
+    Accepts one value or a list of values. A value ending in ``*`` matches
+    every entry starting with the text before it (e.g. ``50787*``).
+    """
+    if value is None:
+        return None
+    values = [value] if isinstance(value, str) else list(value)
+    patterns = tuple(str(v).strip() for v in values if v is not None and str(v).strip())
+    return patterns or None
+
+def is_exact(patterns):
+    """True for a single pattern without a wildcard, the filter every storage backend supports"""
+    return patterns is None or (len(patterns) == 1 and not patterns[0].endswith("*"))
+
+def _sorted_union(arrays):
+    if not arrays:
+        return np.empty(0, dtype=np.intp)
+    return np.unique(np.concatenate(arrays))
+
+class _ColumnIndex:
+    """Row positions of a text column grouped by distinct value
+
+    The distinct values are kept sorted so exact and prefix lookups are a
+    binary search; the lower-cased copy for case-insensitive lookups is only
+    built the first time one is asked for.
+    """
+
+    def __init__(self, values):
+        categorical = pd.Categorical(values)
+        codes = np.asarray(categorical.codes)
+        self._values = np.asarray(categorical.categories.astype(str), dtype=object)
+        self._codes = np.arange(len(self._values))
+        # Categories usually come sorted, so a run of values is one run of grouped rows
+        self._sorted = pd.Index(self._values).is_monotonic_increasing
+        if not self._sorted:
+            order = np.argsort(self._values, kind="stable")
+            self._values, self._codes = self._values[order], self._codes[order]
+        # Rows grouped by code; missing values (code -1) sort first and are never matched
+        self._rows = np.argsort(codes, kind="stable")
+        self._bounds = np.searchsorted(codes[self._rows], np.arange(len(self._values) + 1))
+        self._folded = None
+
+    def _keys(self, case_sensitive):
+        if case_sensitive:
+            return self._values, self._codes
+        if self._folded is None:
+            folded = np.array([value.lower() for value in self._values], dtype=object)
+            order = np.argsort(folded, kind="stable")
+            self._folded = (folded[order], self._codes[order])
+        return self._folded
+
+    def positions(self, patterns, case_sensitive=True):
+        """Sorted row positions matching any of the patterns"""
+        keys, codes = self._keys(case_sensitive)
+        matched = []
+        rows = []
+        for pattern in patterns:
+            prefix = pattern.endswith("*")
+            text = pattern[:-1] if prefix else pattern
+            if not case_sensitive:
+                text = text.lower()
+            low = np.searchsorted(keys, text, "left")
+            high = np.searchsorted(keys, text + _PREFIX_END if prefix else text, "left" if prefix else "right")
+            if case_sensitive and self._sorted:
+                rows.append(self._rows[self._bounds[low]:self._bounds[high]])
+            else:
+                matched.extend(codes[low:high])
+        rows.extend(self._rows[self._bounds[code]:self._bounds[code + 1]] for code in matched)
+        return _sorted_union(rows)
+
+class ReportIndex:
+    """Lookup structures over one reports frame for search_data
+
+    Dates are kept as a sorted array so a date range is two binary searches,
+    and BatchCode/VariantName get per-value position lists. Filters are
+    answered as row positions, so only the matching rows are ever copied.
+    """
+
+    def __init__(self, df):
+        self.df = df
+        dates = pd.to_datetime(df["Date"], errors="coerce").to_numpy(dtype="datetime64[ns]")
+        # NaT sorts last, so it never falls inside a searched range
+        self._date_rows = np.argsort(dates, kind="stable")
+        self._dates = dates[self._date_rows]
+        self._columns = {}
+
+    def _column(self, col):
+        if col not in self._columns:
+            self._columns[col] = _ColumnIndex(self.df[col])
+        return self._columns[col]
+
+    def date_positions(self, start_date, end_date):
+        """Sorted row positions with start_date <= Date <= end_date"""
+        low = np.searchsorted(self._dates, np.datetime64(pd.Timestamp(start_date), "ns"), "left")
+        high = np.searchsorted(self._dates, np.datetime64(pd.Timestamp(end_date), "ns"), "right")
+        return np.sort(self._date_rows[low:high])
+
+    def search(self, start_date=None, end_date=None, batch_code=None, variant_name=None, case_sensitive=True):
+        """Copy of the rows matching every given filter, in their original order"""
+        candidates = []
+        if start_date and end_date:
+            candidates.append(self.date_positions(start_date, end_date))
+        for col, value in (("BatchCode", batch_code), ("VariantName", variant_name)):
+            patterns = parse_patterns(value)
+            if patterns is not None:
+                candidates.append(self._column(col).positions(patterns, case_sensitive))
+        if not candidates:
+            # Callers may modify the result, and self.df is often the shared cached frame
+            return self.df.copy()
+
+        # Intersect from the most selective filter down
+        candidates.sort(key=len)
+        positions = candidates[0]
+        for other in candidates[1:]:
+            positions = np.intersect1d(positions, other, assume_unique=True)
+        return self.df.iloc[positions]
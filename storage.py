@@ -0,0 +1,647 @@
+import os
+import time
+import uuid
+import fcntl
+import shutil
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+import pandas as pd
+from schema import COLUMNS, COUNT_COLUMNS, ID_COLUMN, TEXT_DTYPES, assign_report_ids
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on a sidecar lock file for the duration of a write"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def replace_atomic(path, write):
+    """Call write(tmp_path) then rename the finished temp file over path
+
+    The temp name is unique per call, as Streamlit sessions are threads of
+    one process and may write the same file at once.
+    """
+    tmp_path = f"{path}.{uuid.uuid4().hex[:12]}.tmp"
+    try:
+        write(tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def write_atomic(df, path, **to_csv_args):
+    """Write a full dataframe to a temp file and rename it over the target"""
+    replace_atomic(path, lambda tmp_path: df.to_csv(tmp_path, index=False, **to_csv_args))
+
+def write_text_atomic(path, text):
+    """Write text to a temp file and rename it over the target"""
+    def write(tmp_path):
+        with open(tmp_path, "w") as f:
+            f.write(text)
+    replace_atomic(path, write)
+
+def _date_text(value):
+    """Normalise a date-like value to the ISO text stored on disk"""
+    return pd.Timestamp(value).strftime("%Y-%m-%d")
+
+def _month(partition):
+    """Month key of a ``Month=YYYY-MM`` partition directory"""
+    return os.path.basename(partition).split("=", 1)[1]
+
+def _chunks(values, size=500):
+    """Split values into lists small enough for one SQL statement"""
+    values = list(values)
+    return [values[start:start + size] for start in range(0, len(values), size)]
+
+# Parsed archive segments kept in memory, keyed by path and file stat
+SEGMENT_CACHE_SIZE = 12
+_segment_cache = OrderedDict()
+_segment_cache_lock = threading.Lock()
+
+def _read_segment(path):
+    """Parse a gzip archive segment, reusing the frame while the file is unchanged"""
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    with _segment_cache_lock:
+        if key in _segment_cache:
+            _segment_cache.move_to_end(key)
+            return _segment_cache[key]
+    df = pd.read_csv(path, compression="gzip", dtype=TEXT_DTYPES)
+    with _segment_cache_lock:
+        _segment_cache[key] = df
+        while len(_segment_cache) > SEGMENT_CACHE_SIZE:
+            _segment_cache.popitem(last=False)
+    return df
+
+class CSVStorage:
+    """Reports stored in an append-only CSV file, with older months archived as gzip segments
+
+    New reports go to the hot file at path. archive() moves whole months out
+    of it into archive_dir/reports-YYYY-MM.csv.gz, and once segments exist
+    query() and count() only open the segments overlapping the date range.
+
+    Deletes only append the deleted ReportIDs to a tombstone file next to the
+    CSV; reads skip those rows until compact() rewrites the affected files.
+    """
+
+    name = "csv"
+
+    def __init__(self, path, archive_dir=None):
+        self.path = path
+        self.tombstone_path = path + ".tombstones"
+        self.archive_dir = archive_dir
+
+    @property
+    def indexed(self):
+        """Date-range queries are pushed down once there are archive segments to skip"""
+        return bool(self._segments())
+
+    def _segments(self):
+        """(month, path) of every archive segment, oldest first"""
+        if not self.archive_dir or not os.path.isdir(self.archive_dir):
+            return []
+        segments = []
+        for name in os.listdir(self.archive_dir):
+            if name.startswith("reports-") and name.endswith(".csv.gz"):
+                segments.append((name[len("reports-"):-len(".csv.gz")], os.path.join(self.archive_dir, name)))
+        return sorted(segments)
+
+    def _segment_path(self, month):
+        return os.path.join(self.archive_dir, f"reports-{month}.csv.gz")
+
+    def _header(self):
+        with open(self.path) as f:
+            return f.readline().strip().split(",")
+
+    def ensure(self):
+        """Create the CSV file with a header row if it is missing, and bring other headers to COLUMNS
+
+        append() writes rows by position, so a file whose header is in another
+        order, lacks ReportID (written before reports had IDs) or lacks other
+        columns is rewritten once in COLUMNS order. Unknown columns are
+        rejected rather than dropped.
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if not os.path.exists(self.path):
+            with file_lock(self.path):
+                if not os.path.exists(self.path):
+                    write_atomic(pd.DataFrame(columns=COLUMNS), self.path)
+        elif self._header() != COLUMNS:
+            with file_lock(self.path):
+                header = self._header()
+                if header == COLUMNS:
+                    return
+                unknown = [col for col in header if col not in COLUMNS]
+                if unknown:
+                    raise ValueError(f"{self.path} has unexpected columns: {', '.join(unknown)}")
+                df = pd.read_csv(self.path, dtype=str, keep_default_na=False)
+                write_atomic(assign_report_ids(df.reindex(columns=COLUMNS)), self.path)
+
+    def append(self, df):
+        """Append rows to the end of the file under the write lock"""
+        with file_lock(self.path):
+            with open(self.path, "a+b") as f:
+                # Hand-edited files may lack a trailing newline
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b"\n":
+                        f.write(b"\n")
+            df.to_csv(self.path, mode="a", header=False, index=False)
+
+    def signature(self):
+        """Cheap token that changes whenever the file, its tombstones or the archive are written"""
+        parts = []
+        for path in [self.path, self.tombstone_path] + [path for _, path in self._segments()]:
+            try:
+                stat = os.stat(path)
+                parts.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                parts.append(None)
+        return tuple(parts)
+
+    def tombstones(self):
+        """ReportIDs deleted but still physically present in the files"""
+        try:
+            with open(self.tombstone_path) as f:
+                return set(f.read().split())
+        except FileNotFoundError:
+            return set()
+
+    def tombstone_count(self):
+        return len(self.tombstones())
+
+    def fragment_count(self):
+        """Appends are written to one file, so there are no fragments to merge"""
+        return 0
+
+    def _read(self, start_date=None, end_date=None):
+        """Rows of the hot file and of the segments overlapping the date range, minus deletes"""
+        segments = self._segments()
+        if start_date is not None:
+            segments = [(month, path) for month, path in segments if month >= _date_text(start_date)[:7]]
+        if end_date is not None:
+            segments = [(month, path) for month, path in segments if month <= _date_text(end_date)[:7]]
+        frames = [_read_segment(path) for _, path in segments]
+        frames.append(pd.read_csv(self.path, dtype=TEXT_DTYPES))
+        df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        deleted = self.tombstones()
+        if deleted:
+            df = df[~df[ID_COLUMN].isin(deleted)].reset_index(drop=True)
+        return df
+
+    def load(self):
+        """Read every stored row that has not been deleted"""
+        return self._read()
+
+    def query(self, start_date=None, end_date=None, batch_code=None, variant_name=None, columns=None,
+              offset=0, limit=None):
+        """Read only the segments the date range touches, then filter the rows"""
+        df = self._read(start_date, end_date)
+        mask = pd.Series(True, index=df.index)
+        if start_date is not None or end_date is not None:
+            dates = pd.to_datetime(df["Date"], errors="coerce")
+            if start_date is not None:
+                mask &= dates >= pd.Timestamp(start_date)
+            if end_date is not None:
+                mask &= dates <= pd.Timestamp(end_date)
+        if batch_code is not None:
+            mask &= df["BatchCode"] == batch_code
+        if variant_name is not None:
+            mask &= df["VariantName"] == variant_name
+        df = df[mask]
+        if columns:
+            df = df[list(columns)]
+        if limit is not None:
+            df = df.iloc[offset:offset + limit]
+        return df.reset_index(drop=True)
+
+    def count(self, start_date=None, end_date=None, batch_code=None, variant_name=None):
+        """Number of rows matching the filters"""
+        return len(self.query(start_date, end_date, batch_code, variant_name, columns=["Date"]))
+
+    def delete_ids(self, report_ids):
+        """Mark reports deleted by appending their IDs to the tombstone file"""
+        report_ids = list(report_ids)
+        if not report_ids:
+            return 0
+        with file_lock(self.path):
+            with open(self.tombstone_path, "a") as f:
+                f.write("".join(f"{report_id}\n" for report_id in report_ids))
+        return len(report_ids)
+
+    def restore(self, df):
+        """Bring deleted reports back, clearing tombstones and re-appending compacted rows"""
+        with file_lock(self.path):
+            deleted = self.tombstones()
+            ids = set(df[ID_COLUMN])
+            if deleted & ids:
+                remaining = "".join(f"{report_id}\n" for report_id in sorted(deleted - ids))
+                write_text_atomic(self.tombstone_path, remaining)
+        compacted = df[~df[ID_COLUMN].isin(deleted)]
+        if not compacted.empty:
+            self.append(compacted)
+
+    def compact(self):
+        """Rewrite the hot file and affected segments without tombstoned rows
+
+        Returns how many rows were dropped.
+        """
+        with file_lock(self.path):
+            deleted = self.tombstones()
+            if not deleted:
+                return 0
+            removed = 0
+            for _, path in self._segments():
+                df = pd.read_csv(path, compression="gzip", dtype=str, keep_default_na=False)
+                mask = df[ID_COLUMN].isin(deleted)
+                if mask.any():
+                    write_atomic(df[~mask], path, compression="gzip")
+                    removed += int(mask.sum())
+            df = pd.read_csv(self.path, dtype=str, keep_default_na=False)
+            mask = df[ID_COLUMN].isin(deleted)
+            write_atomic(df[~mask], self.path)
+            os.remove(self.tombstone_path)
+        return removed + int(mask.sum())
+
+    def archive(self, before_month):
+        """Move hot rows dated before before_month (YYYY-MM) into monthly gzip segments
+
+        Segments are written before the hot file is trimmed, and merging
+        drops duplicate ReportIDs, so an interrupted run is repaired by the
+        next one. Returns how many rows were moved.
+        """
+        if not self.archive_dir:
+            return 0
+        with file_lock(self.path):
+            df = pd.read_csv(self.path, dtype=str, keep_default_na=False)
+            months = pd.to_datetime(df["Date"], errors="coerce").dt.strftime("%Y-%m")
+            old = months.notna() & (months < before_month)
+            if not old.any():
+                return 0
+            os.makedirs(self.archive_dir, exist_ok=True)
+            for month, rows in df[old].groupby(months[old]):
+                path = self._segment_path(month)
+                if os.path.exists(path):
+                    existing = pd.read_csv(path, compression="gzip", dtype=str, keep_default_na=False)
+                    rows = pd.concat([existing, rows], ignore_index=True).drop_duplicates(ID_COLUMN, keep="last")
+                write_atomic(rows, path, compression="gzip")
+            write_atomic(df[~old], self.path)
+        return int(old.sum())
+
+    def delete_all(self):
+        """Truncate the file back to its header row and drop the archive"""
+        with file_lock(self.path):
+            write_atomic(pd.DataFrame(columns=COLUMNS), self.path)
+            if os.path.exists(self.tombstone_path):
+                os.remove(self.tombstone_path)
+            for _, path in self._segments():
+                os.remove(path)
+
+class SQLiteStorage:
+    """Reports stored in a local SQLite database with lookup indexes"""
+
+    name = "sqlite"
+    indexed = True
+
+    def __init__(self, path):
+        self.path = path
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection that commits on success and always closes"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def ensure(self):
+        """Create the reports table and its indexes if they are missing"""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        columns = ", ".join(
+            f'"{col}" TEXT' if col in ("Date", "VariantName", "BatchCode", ID_COLUMN) else f'"{col}" REAL'
+            for col in COLUMNS
+        )
+        with self._connect() as conn:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS reports ({columns})")
+            existing = [row[1] for row in conn.execute("PRAGMA table_info(reports)")]
+            if ID_COLUMN not in existing:
+                # Databases created before reports had IDs are migrated once
+                conn.execute(f'ALTER TABLE reports ADD COLUMN "{ID_COLUMN}" TEXT')
+                conn.execute(f'UPDATE reports SET "{ID_COLUMN}" = lower(hex(randomblob(8)))')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_reports_date ON reports ("Date")')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_reports_variant ON reports ("VariantName", "Date")')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_reports_batch ON reports ("BatchCode", "Date")')
+            conn.execute(f'CREATE INDEX IF NOT EXISTS idx_reports_id ON reports ("{ID_COLUMN}")')
+
+    def append(self, df):
+        """Insert rows in a single transaction"""
+        df = df.copy()
+        df["Date"] = pd.to_datetime(df["Date"], errors="coerce").dt.strftime("%Y-%m-%d")
+        names = ", ".join(f'"{col}"' for col in COLUMNS)
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        rows = df[COLUMNS].astype(object).where(df[COLUMNS].notna(), None).values.tolist()
+        with self._connect() as conn:
+            conn.executemany(f"INSERT INTO reports ({names}) VALUES ({placeholders})", rows)
+
+    def signature(self):
+        """Cheap token that changes whenever the database or its WAL is written"""
+        parts = []
+        for path in (self.path, self.path + "-wal"):
+            try:
+                stat = os.stat(path)
+                parts.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                parts.append(None)
+        return tuple(parts)
+
+    def _where(self, start_date=None, end_date=None, batch_code=None, variant_name=None):
+        clauses, params = [], []
+        if start_date is not None:
+            clauses.append('"Date" >= ?')
+            params.append(_date_text(start_date))
+        if end_date is not None:
+            clauses.append('"Date" <= ?')
+            params.append(_date_text(end_date))
+        if batch_code is not None:
+            clauses.append('"BatchCode" = ?')
+            params.append(batch_code)
+        if variant_name is not None:
+            clauses.append('"VariantName" = ?')
+            params.append(variant_name)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return where, params
+
+    def load(self):
+        """Read every stored row in insertion order"""
+        return self.query()
+
+    def query(self, start_date=None, end_date=None, batch_code=None, variant_name=None, columns=None,
+              offset=0, limit=None):
+        """Read only the rows matching the filters using the indexes"""
+        where, params = self._where(start_date, end_date, batch_code, variant_name)
+        selected = ", ".join(f'"{col}"' for col in columns) if columns else "*"
+        page = ""
+        if limit is not None:
+            page = " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        with self._connect() as conn:
+            df = pd.read_sql_query(f"SELECT {selected} FROM reports{where} ORDER BY rowid{page}", conn, params=params)
+        return df
+
+    def count(self, start_date=None, end_date=None, batch_code=None, variant_name=None):
+        """Number of rows matching the filters"""
+        where, params = self._where(start_date, end_date, batch_code, variant_name)
+        with self._connect() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM reports{where}", params).fetchone()[0]
+
+    def delete_ids(self, report_ids):
+        """Delete the reports with these IDs using the ReportID index"""
+        deleted = 0
+        with self._connect() as conn:
+            for chunk in _chunks(report_ids):
+                placeholders = ", ".join("?" for _ in chunk)
+                deleted += conn.execute(
+                    f'DELETE FROM reports WHERE "{ID_COLUMN}" IN ({placeholders})', chunk
+                ).rowcount
+        return deleted
+
+    def restore(self, df):
+        """Re-insert previously deleted reports"""
+        self.append(df)
+
+    def tombstone_count(self):
+        return 0
+
+    def fragment_count(self):
+        """Rows live in one database file, so there are no fragments to merge"""
+        return 0
+
+    def compact(self):
+        """Deletes are applied immediately, so there is nothing to compact"""
+        return 0
+
+    def archive(self, before_month):
+        """Date-range queries already use the Date index, so nothing is archived"""
+        return 0
+
+    def delete_all(self):
+        """Remove every stored row"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM reports")
+
+class ParquetStorage:
+    """Reports stored as Parquet files partitioned by month
+
+    Each append writes a new file under ``Month=YYYY-MM/``, and queries push
+    the date/variant/batch filters into the reader so only overlapping
+    partitions, row groups and requested columns are decoded.
+    """
+
+    name = "parquet"
+    indexed = True
+
+    def __init__(self, path):
+        self.path = path
+
+    def _arrow_schema(self):
+        import pyarrow as pa
+        types = {"Date": pa.date32(), "VariantName": pa.string(), "BatchCode": pa.string(), ID_COLUMN: pa.string()}
+        return pa.schema([pa.field(col, types.get(col, pa.float64())) for col in COLUMNS])
+
+    def _partitions(self):
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(entry.path for entry in os.scandir(self.path) if entry.is_dir())
+
+    def _files(self, partition):
+        return sorted(
+            os.path.join(partition, name) for name in os.listdir(partition) if name.endswith(".parquet")
+        )
+
+    def _write_partition(self, partition, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        os.makedirs(partition, exist_ok=True)
+        table = pa.Table.from_pandas(df[COLUMNS], schema=self._arrow_schema(), preserve_index=False)
+        file_name = f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet"
+        replace_atomic(os.path.join(partition, file_name), lambda tmp_path: pq.write_table(table, tmp_path))
+
+    def ensure(self):
+        """Create the dataset directory if it is missing, and give old rows IDs"""
+        os.makedirs(self.path, exist_ok=True)
+        marker = os.path.join(self.path, "_report_ids")
+        if os.path.exists(marker):
+            return
+        # Datasets written before reports had IDs are migrated once
+        import pyarrow.parquet as pq
+        with file_lock(self.path):
+            for partition in self._partitions():
+                files = self._files(partition)
+                if files and any(ID_COLUMN not in pq.read_schema(path).names for path in files):
+                    df = pd.concat([pq.read_table(path).to_pandas() for path in files], ignore_index=True)
+                    self._write_partition(partition, assign_report_ids(df.reindex(columns=COLUMNS)))
+                    for path in files:
+                        os.remove(path)
+            open(marker, "w").close()
+
+    def append(self, df):
+        """Write the rows as one new file per month they fall in"""
+        df = df.copy()
+        df["Date"] = pd.to_datetime(df["Date"], errors="coerce").dt.date
+        for col in ("VariantName", "BatchCode", ID_COLUMN):
+            df[col] = df[col].astype("string")
+        for col in COUNT_COLUMNS:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+        months = pd.to_datetime(df["Date"]).dt.strftime("%Y-%m").fillna("none")
+        with file_lock(self.path):
+            for month, part in df.groupby(months, sort=True):
+                self._write_partition(os.path.join(self.path, f"Month={month}"), part)
+
+    def signature(self):
+        """Cheap token that changes whenever a partition gains or loses files"""
+        parts = []
+        for partition in self._partitions():
+            stat = os.stat(partition)
+            parts.append((partition, stat.st_mtime_ns, len(os.listdir(partition))))
+        return tuple(parts)
+
+    def load(self):
+        """Read every stored row"""
+        return self.query()
+
+    def _scan(self, start_date=None, end_date=None, batch_code=None, variant_name=None):
+        """Dataset over the partitions overlapping the date range, plus the row filter"""
+        import pyarrow.dataset as ds
+        partitions = self._partitions()
+        if start_date is not None:
+            partitions = [p for p in partitions if _month(p) >= _date_text(start_date)[:7]]
+        if end_date is not None:
+            partitions = [p for p in partitions if _month(p) <= _date_text(end_date)[:7]]
+        files = [path for partition in partitions for path in self._files(partition)]
+        if not files:
+            return None, None
+
+        dataset = ds.dataset(files, schema=self._arrow_schema(), format="parquet")
+        condition = None
+        for expression in self._filters(start_date, end_date, batch_code, variant_name):
+            condition = expression if condition is None else condition & expression
+        return dataset, condition
+
+    def query(self, start_date=None, end_date=None, batch_code=None, variant_name=None, columns=None,
+              offset=0, limit=None):
+        """Read only matching rows, pruning partitions and row groups by the filters"""
+        dataset, condition = self._scan(start_date, end_date, batch_code, variant_name)
+        if dataset is None:
+            return pd.DataFrame(columns=columns or COLUMNS)
+        table = dataset.to_table(columns=list(columns or COLUMNS), filter=condition)
+        if limit is not None:
+            table = table.slice(offset, limit)
+        return table.to_pandas()
+
+    def count(self, start_date=None, end_date=None, batch_code=None, variant_name=None):
+        """Number of rows matching the filters, answered from file metadata when unfiltered"""
+        dataset, condition = self._scan(start_date, end_date, batch_code, variant_name)
+        if dataset is None:
+            return 0
+        return dataset.count_rows(filter=condition)
+
+    def _filters(self, start_date=None, end_date=None, batch_code=None, variant_name=None):
+        import pyarrow.dataset as ds
+        filters = []
+        if start_date is not None:
+            filters.append(ds.field("Date") >= pd.Timestamp(start_date).date())
+        if end_date is not None:
+            filters.append(ds.field("Date") <= pd.Timestamp(end_date).date())
+        if batch_code is not None:
+            filters.append(ds.field("BatchCode") == batch_code)
+        if variant_name is not None:
+            filters.append(ds.field("VariantName") == variant_name)
+        return filters
+
+    def delete_ids(self, report_ids):
+        """Rewrite only the partitions holding one of these reports
+
+        Partitions are checked by reading just their ReportID column.
+        """
+        import pyarrow.parquet as pq
+        report_ids = set(report_ids)
+        deleted = 0
+        with file_lock(self.path):
+            for partition in self._partitions():
+                files = self._files(partition)
+                if not any(
+                    pq.read_table(path, columns=[ID_COLUMN]).column(0).to_pandas().isin(report_ids).any()
+                    for path in files
+                ):
+                    continue
+                df = pd.concat([pq.read_table(path).to_pandas() for path in files], ignore_index=True)
+                mask = df[ID_COLUMN].isin(report_ids)
+                deleted += int(mask.sum())
+                if not mask.all():
+                    self._write_partition(partition, df[~mask])
+                for path in files:
+                    os.remove(path)
+        return deleted
+
+    def restore(self, df):
+        """Re-insert previously deleted reports"""
+        self.append(df)
+
+    def tombstone_count(self):
+        return 0
+
+    def fragment_count(self):
+        """Files beyond the first in each month partition, left behind by appends"""
+        return sum(max(len(self._files(partition)) - 1, 0) for partition in self._partitions())
+
+    def compact(self):
+        """Merge each partition's append files into one file
+
+        Returns 0, as deletes are applied immediately and no rows are dropped.
+        """
+        import pyarrow.parquet as pq
+        with file_lock(self.path):
+            for partition in self._partitions():
+                files = self._files(partition)
+                if len(files) < 2:
+                    continue
+                df = pd.concat([pq.read_table(path).to_pandas() for path in files], ignore_index=True)
+                self._write_partition(partition, df)
+                for path in files:
+                    os.remove(path)
+        return 0
+
+    def archive(self, before_month):
+        """Date-range queries already read only the month partitions they overlap, so nothing is archived"""
+        return 0
+
+    def delete_all(self):
+        """Remove every partition"""
+        with file_lock(self.path):
+            for partition in self._partitions():
+                shutil.rmtree(partition)
+
+def migrate_csv(csv_path, target, chunksize=100000, archive_dir=None):
+    """Copy every row of a reports CSV and its archive, except tombstoned ones, into another storage backend"""
+    target.ensure()
+    source = CSVStorage(csv_path, archive_dir)
+    deleted = source.tombstones()
+    copied = 0
+    paths = [path for _, path in source._segments()] + [csv_path]
+    for path in paths:
+        for chunk in pd.read_csv(path, chunksize=chunksize, dtype=TEXT_DTYPES):
+            chunk = assign_report_ids(chunk.reindex(columns=COLUMNS))
+            chunk = chunk[~chunk[ID_COLUMN].isin(deleted)]
+            target.append(chunk)
+            copied += len(chunk)
+    return copied
@@ -1,6 +1,8 @@
 import plotly.express as px
 import plotly.graph_objects as go
 import pandas as pd
+from schema import REJECTION_COLUMNS
+from profiling import profiled
 
 def create_bar_chart(df):
     """Create department distribution bar chart"""
@@ -49,29 +51,35 @@ def create_task_distribution_chart(df):
     )
     return fig
 
-def create_daily_production_chart(df):
-    """Create daily production overview chart"""
-    daily_prod = df.groupby(["Date", "VariantName"])[["TotalCase", "LooseCans"]].sum().reset_index()
+# Title prefix and x-axis label for each rollup granularity
+PERIOD_LABELS = {
+    "day": ("Daily", "Date"),
+    "week": ("Weekly", "Week Starting"),
+    "month": ("Monthly", "Month"),
+}
+
+@profiled()
+def create_daily_production_chart(df, granularity="day"):
+    """Create production overview chart from report rows, the daily rollup or a bucketed rollup
+
+    granularity only labels the chart; bucket the input with rollup.bucket_rollup.
+    """
+    title, date_label = PERIOD_LABELS[granularity]
+    daily_prod = df.groupby(["Date", "VariantName"], observed=True)[["TotalCase", "LooseCans"]].sum().reset_index()
     fig = px.bar(
         daily_prod,
         x="Date",
         y="TotalCase",
         color="VariantName",
-        title="Daily Production by Variant",
-        labels={"Date": "Date", "TotalCase": "Total Cases"}
+        title=f"{title} Production by Variant",
+        labels={"Date": date_label, "TotalCase": "Total Cases"}
     )
     return fig
 
+@profiled()
 def create_rejection_summary_chart(df):
-    """Create rejection analysis chart"""
-    rejection_columns = [
-        "EmptyRejection", "FilledRejection", "BreakdownRejection",
-        "ManpowerDentRejection", "HighPressureRejection", "WaterCanRejection",
-        "MachineDentCans", "FadeCans", "UnprintedCans", "ScratchedCans",
-        "LidRejection"
-    ]
-
-    rejection_totals = df[rejection_columns].sum().reset_index()
+    """Create rejection analysis chart from report rows or the daily rollup"""
+    rejection_totals = df[REJECTION_COLUMNS].sum().reset_index()
     rejection_totals.columns = ['RejectionType', 'Count']
 
     fig = px.pie(
@@ -80,4 +88,37 @@ def create_rejection_summary_chart(df):
         names="RejectionType",
         title="Distribution of Rejections by Type"
     )
-    return fig
\ No newline at end of file
+    return fig
+
+@profiled()
+def create_pareto_chart(pareto, title="Rejection Pareto"):
+    """Create a Pareto chart: rejection counts as bars, cumulative share as a line"""
+    fig = go.Figure()
+    fig.add_trace(go.Bar(x=pareto["RejectionType"], y=pareto["Count"], name="Rejections"))
+    fig.add_trace(go.Scatter(
+        x=pareto["RejectionType"],
+        y=pareto["CumulativeShare"],
+        name="Cumulative %",
+        yaxis="y2",
+        mode="lines+markers"
+    ))
+    fig.update_layout(
+        title=title,
+        yaxis=dict(title="Rejections"),
+        yaxis2=dict(title="Cumulative %", overlaying="y", side="right", range=[0, 105]),
+        legend=dict(orientation="h")
+    )
+    return fig
+
+@profiled()
+def create_rejection_trend_chart(trends, title="Rejections per 1,000 Cans"):
+    """Create rejection rate trend chart with the daily rate and its rolling averages"""
+    rate_columns = [col for col in trends.columns if col == "RatePer1000" or col.startswith("Rolling")]
+    fig = px.line(
+        trends,
+        x="Date",
+        y=rate_columns,
+        title=title,
+        labels={"value": "Rejections per 1,000 cans", "variable": ""}
+    )
+    return fig
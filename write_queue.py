@@ -0,0 +1,206 @@
+import os
+import json
+import logging
+import threading
+import pandas as pd
+from storage import file_lock, write_text_atomic
+from schema import ENTRY_COLUMNS, ID_COLUMN, new_report_ids
+from data_handler import save_many, load_data
+from bulk_import import validate_chunk
+
+# Submitted reports are appended here and fsynced before the form returns
+WAL_FILE = "data/pending_reports.jsonl"
+
+# Byte offset of the first WAL entry not yet saved to storage
+CHECKPOINT_FILE = "data/pending_reports.checkpoint"
+
+# Entries that could not be saved after SAVE_ATTEMPTS tries, with the error
+DEAD_LETTER_FILE = "data/pending_reports.failed.jsonl"
+
+# Entries saved to storage per save_many call
+WRITE_BATCH_SIZE = 500
+
+# Tries at saving one entry on its own before it is moved to DEAD_LETTER_FILE
+SAVE_ATTEMPTS = 3
+
+# Seconds the writer sleeps between checks when nothing wakes it
+FLUSH_INTERVAL = 2.0
+
+logger = logging.getLogger(__name__)
+
+_wake = threading.Event()
+_writer = {"thread": None, "replayed": False}
+_failures = {}
+_writer_lock = threading.Lock()
+
+def validate_report(record):
+    """The report normalised by the bulk import rules; raises ValueError listing its problems"""
+    chunk = pd.DataFrame([record]).reindex(columns=ENTRY_COLUMNS)
+    chunk = chunk.astype(object).where(chunk.notna(), "")
+    records, errors = validate_chunk(chunk, set(), first_row=1)
+    if errors:
+        raise ValueError(errors[0]["Errors"])
+    return records[0]
+
+def enqueue_report(record):
+    """Validate and durably queue a report for the background writer; returns its ReportID"""
+    report_id = record.get(ID_COLUMN) or new_report_ids(1)[0]
+    record = validate_report(record)
+    record[ID_COLUMN] = report_id
+    line = json.dumps(record, default=str) + "\n"
+    os.makedirs(os.path.dirname(WAL_FILE) or ".", exist_ok=True)
+    with file_lock(WAL_FILE):
+        with open(WAL_FILE, "a+b") as f:
+            # Never glue a new entry onto a line torn by a crash
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    line = "\n" + line
+            f.write(line.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+    _wake.set()
+    return record[ID_COLUMN]
+
+def _read_checkpoint():
+    try:
+        with open(CHECKPOINT_FILE) as f:
+            return json.load(f)["offset"]
+    except (FileNotFoundError, ValueError, KeyError):
+        return 0
+
+def _write_checkpoint(offset):
+    write_text_atomic(CHECKPOINT_FILE, json.dumps({"offset": offset}))
+
+def _read_batch(offset, limit):
+    """Up to limit (record, offset just past it) pairs queued after offset, and the offset just past them
+
+    Runs under the WAL lock, so a final line without a newline can only be
+    left over from a crash mid-append; it is skipped.
+    """
+    records = []
+    with file_lock(WAL_FILE):
+        try:
+            f = open(WAL_FILE, "rb")
+        except FileNotFoundError:
+            return records, 0
+        with f:
+            f.seek(offset)
+            while len(records) < limit:
+                line = f.readline()
+                if not line:
+                    break
+                offset += len(line)
+                try:
+                    records.append((json.loads(line), offset))
+                except ValueError:
+                    logger.warning("Skipping unreadable queued report at byte %d of %s", offset - len(line), WAL_FILE)
+    return records, offset
+
+def _truncate_if_drained(offset):
+    """Start the WAL afresh once every entry in it has been saved"""
+    with file_lock(WAL_FILE):
+        if os.path.exists(WAL_FILE) and os.path.getsize(WAL_FILE) == offset:
+            open(WAL_FILE, "w").close()
+            _write_checkpoint(0)
+
+def pending_count():
+    """Queued reports not yet saved to storage"""
+    offset = _read_checkpoint()
+    try:
+        with open(WAL_FILE, "rb") as f:
+            f.seek(offset)
+            return sum(1 for _ in f)
+    except FileNotFoundError:
+        return 0
+
+def _dead_letter(record, error):
+    """Set aside an entry that cannot be saved so the entries after it are not held up"""
+    logger.error("Moving queued report %s to %s: %s", record.get(ID_COLUMN), DEAD_LETTER_FILE, error)
+    with file_lock(DEAD_LETTER_FILE):
+        with open(DEAD_LETTER_FILE, "a") as f:
+            f.write(json.dumps({"record": record, "error": repr(error)}, default=str) + "\n")
+
+def _save_each(entries, offset):
+    """Save a batch that failed as a whole one entry at a time
+
+    Returns how many were saved and the offset reached. An entry failing on
+    its own is retried on later drains and dead-lettered after SAVE_ATTEMPTS
+    tries; until then the drain stops in front of it.
+    """
+    saved = 0
+    for record, next_offset in entries:
+        try:
+            saved += save_many([record])
+        except Exception as e:
+            key = record.get(ID_COLUMN)
+            _failures[key] = _failures.get(key, 0) + 1
+            if _failures[key] < SAVE_ATTEMPTS:
+                return saved, offset, e
+            del _failures[key]
+            _dead_letter(record, e)
+        offset = next_offset
+        _write_checkpoint(offset)
+    return saved, offset, None
+
+def failed_count():
+    """Queued reports moved to DEAD_LETTER_FILE because they could not be saved"""
+    try:
+        with open(DEAD_LETTER_FILE, "rb") as f:
+            return sum(1 for _ in f)
+    except FileNotFoundError:
+        return 0
+
+def drain(dedupe=False):
+    """Save every queued report to storage in batches; returns how many were saved
+
+    With dedupe, entries whose ReportID is already stored are skipped. That
+    covers a crash between save_many and the checkpoint, so it is only
+    needed when replaying the WAL after a restart.
+    """
+    saved = 0
+    with file_lock(CHECKPOINT_FILE):
+        offset = _read_checkpoint()
+        stored = set(load_data()[ID_COLUMN]) if dedupe else set()
+        while True:
+            entries, next_offset = _read_batch(offset, WRITE_BATCH_SIZE)
+            if next_offset <= offset:
+                break
+            batch = []
+            for record, entry_offset in entries:
+                if record.get(ID_COLUMN) not in stored:
+                    stored.add(record.get(ID_COLUMN))
+                    batch.append((record, entry_offset))
+            try:
+                saved += save_many([record for record, _ in batch])
+            except Exception:
+                count, offset, error = _save_each(batch, offset)
+                saved += count
+                if error is not None:
+                    raise error
+            offset = next_offset
+            _write_checkpoint(offset)
+        _truncate_if_drained(offset)
+    return saved
+
+def _run():
+    while True:
+        _wake.wait(FLUSH_INTERVAL)
+        _wake.clear()
+        try:
+            drain(dedupe=not _writer["replayed"])
+            _writer["replayed"] = True
+        except Exception:
+            logger.exception("Saving queued reports failed; retrying")
+
+def start_writer():
+    """Start the background writer once per process; it first replays any pending entries"""
+    with _writer_lock:
+        thread = _writer["thread"]
+        if thread is not None and thread.is_alive():
+            return thread
+        thread = threading.Thread(target=_run, name="rtd-writer", daemon=True)
+        _writer["thread"] = thread
+        thread.start()
+    _wake.set()
+    return thread